@@ -0,0 +1,3 @@
+"""
+Backend servers and LangGraph workflows for the AI Workflow Engine.
+"""
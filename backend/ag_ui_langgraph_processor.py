@@ -6,10 +6,13 @@ Uses real LangGraph streaming with AG-UI events emitted from nodes
 import os
 import json
 import uuid
+import queue
+import logging
 import sqlite3
 import asyncio
-from datetime import datetime
-from typing import TypedDict, List, Dict, Any, Optional, AsyncGenerator
+import threading
+from contextlib import contextmanager
+from typing import TypedDict, List, Dict, Any, Optional, AsyncGenerator, Iterator
 from typing_extensions import Annotated
 
 from langgraph.graph import StateGraph, END
@@ -21,18 +24,99 @@ except ImportError:
     # Fallback for older versions
     CheckpointMetadata = dict
 from langchain_openai import ChatOpenAI
+from langchain_core.runnables import RunnableConfig
 from langchain.schema import HumanMessage, SystemMessage
 from dotenv import load_dotenv
 
-# Fix import path
-import sys
-import os
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
+from shared.serialization import dumps as _dumps, dumps_pretty as _dumps_pretty, loads as _loads, now_iso as _now_iso
 from shared.types import AgentResponse, AgentState, WorkflowStatus, DocumentExtractedData
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+if sqlite3.threadsafety < 3:
+    logger.warning("SQLite is not built in serialized mode (threadsafety=%d); "
+                   "checkpoint writes rely on the writer lock", sqlite3.threadsafety)
+
+# Connection tuning for the on-disk checkpoint database (all safe under WAL)
+_SQLITE_PRAGMAS = """
+    PRAGMA journal_mode=WAL;
+    PRAGMA synchronous=NORMAL;
+    PRAGMA busy_timeout=5000;
+    PRAGMA cache_size=-65536;
+    PRAGMA temp_store=MEMORY;
+    PRAGMA mmap_size=268435456;
+    PRAGMA wal_autocheckpoint=1000;
+"""
+
+# Read-only checkpoint connections shared by worker threads
+_READER_POOL_SIZE = 4
+
+# Seconds between background PASSIVE WAL checkpoints
+_WAL_CHECKPOINT_INTERVAL = 30
+
+# Streaming queue bound and its end-of-stream marker
+_EVENT_QUEUE_SIZE = 64
+_STREAM_EOF = object()
+
+# Most recent history entries kept in graph state (and so in every checkpoint)
+_HISTORY_LIMIT = 64
+
+def _append_history(state: Dict[str, Any], entry: str) -> None:
+    """Record a history entry, keeping only the newest _HISTORY_LIMIT entries"""
+    history = state["workflow_history"]
+    history.append(entry)
+    if len(history) > _HISTORY_LIMIT:
+        del history[:-_HISTORY_LIMIT]
+
+# Extraction prompt, built once and shared by every extract_data_node call
+_EXTRACTION_PROMPT = """
+You are a document processing assistant. Extract the following information from the given document text:
+
+For invoices:
+- vendor_name: The name of the vendor/company
+- invoice_id: The invoice number or ID
+- due_date: The payment due date
+- total_amount: The total amount due (as a number)
+
+For customer support tickets:
+- customer_name: Customer's name
+- email: Customer's email
+- topic: Main topic/category
+- sentiment: Customer sentiment (Happy, Neutral, Frustrated, Irate)
+- urgency: Urgency level (Low, Medium, High, Critical)
+
+Return the extracted data as a JSON object. If you cannot find a field, set it to null.
+If the document doesn't clearly match either category, try to extract whatever structured information you can.
+"""
+
+_EXTRACTION_SYSTEM_MSG = SystemMessage(content=_EXTRACTION_PROMPT)
+
+# Characters stripped from amounts like "$1,250.00" before float()
+_AMOUNT_STRIP = str.maketrans("", "", "$,")
+
+def _to_amount(amount: Any) -> float:
+    """Parse an extracted amount, skipping string cleanup when the LLM already returned a number"""
+    if isinstance(amount, (int, float)):
+        return float(amount)
+    return float(str(amount).translate(_AMOUNT_STRIP))
+
+_json_decoder = json.JSONDecoder()
+
+def _extract_json_object(text: str) -> Optional[Dict[str, Any]]:
+    """Decode the first JSON object embedded in free-form LLM output"""
+    start = text.find("{")
+    while start != -1:
+        try:
+            value, _ = _json_decoder.raw_decode(text, start)
+            if isinstance(value, dict):
+                return value
+        except json.JSONDecodeError:
+            pass
+        start = text.find("{", start + 1)
+    return None
+
 # AG-UI Compatible LangGraph State
 class AGUIWorkflowState(TypedDict):
     # Core workflow data
@@ -45,42 +129,127 @@ class AGUIWorkflowState(TypedDict):
     status: str  # WorkflowStatus enum values
     human_review_required: bool
     reason_for_review: Optional[str]
+    review_reasons: List[str]  # Set by validate_node, read by the router and review node
     
-    # Event streaming callback
-    stream_callback: Optional[Any]  # AsyncGenerator callback
-    
-    # History tracking
+    # History tracking (bounded to the latest _HISTORY_LIMIT entries)
     workflow_history: List[str]
     created_at: str
     updated_at: str
 
+# STATE_UPDATE field accessors for dict- and object-shaped channel values
+def _dict_state_fields(state_data: Dict[str, Any]):
+    return (
+        state_data.get("workflow_id"),
+        state_data.get("current_step", "unknown"),
+        state_data.get("status", "unknown")
+    )
+
+def _attr_state_fields(state_data: Any):
+    return (
+        getattr(state_data, "workflow_id", None),
+        getattr(state_data, "current_step", "unknown"),
+        getattr(state_data, "status", "unknown")
+    )
+
 class AGUIStreamingCheckpointer(SqliteSaver):
-    """Custom checkpointer that emits AG-UI events on state changes"""
+    """Custom checkpointer that emits AG-UI events on state changes.
+
+    All writes go through the single writer connection owned by SqliteSaver,
+    while reads borrow a connection from a bounded read-only pool so they
+    never queue behind an in-flight checkpoint write.
+    """
     
-    def __init__(self, conn: sqlite3.Connection, stream_callback=None):
+    def __init__(self, conn: sqlite3.Connection, stream_callback=None, reader_path: Optional[str] = None):
         super().__init__(conn)
         self.stream_callback = stream_callback
+        self._write_lock = asyncio.Lock()
+        self._state_fields = None
+        self._reader_path = reader_path
+        self._readers: "queue.Queue[sqlite3.Connection]" = queue.Queue(maxsize=_READER_POOL_SIZE)
+        self._readers_opened = 0
+        self._readers_lock = threading.Lock()
+    
+    def _borrow_reader(self) -> Optional[sqlite3.Connection]:
+        """Take a read-only connection from the pool, opening one while under the bound"""
+        try:
+            return self._readers.get_nowait()
+        except queue.Empty:
+            pass
+        with self._readers_lock:
+            if not self._reader_path:
+                return None
+            if self._readers_opened < _READER_POOL_SIZE:
+                try:
+                    # Borrowed by one thread at a time, so the thread check can be off
+                    reader = sqlite3.connect(self._reader_path, check_same_thread=False)
+                    reader.execute("PRAGMA busy_timeout=5000")
+                    reader.execute("PRAGMA query_only=1")
+                except sqlite3.Error as e:
+                    print(f"Warning: Could not open reader connection, reads will use the writer: {e}")
+                    self._reader_path = None
+                    return None
+                self._readers_opened += 1
+                return reader
+        return self._readers.get()
+    
+    @contextmanager
+    def cursor(self, transaction: bool = True) -> Iterator[sqlite3.Cursor]:
+        """Use the writer for transactions and a pooled reader for plain reads"""
+        reader = None if transaction else self._borrow_reader()
+        if reader is None:
+            with super().cursor(transaction) as cur:
+                yield cur
+            return
         
-    async def aput(self, config, checkpoint: Checkpoint, metadata: dict):
-        """Override to emit AG-UI events when state is saved"""
-        result = await super().aput(config, checkpoint, metadata)
+        try:
+            self.setup()
+            cur = reader.cursor()
+            try:
+                yield cur
+            finally:
+                cur.close()
+        finally:
+            self._readers.put(reader)
+    
+    def close(self):
+        """Close the pooled readers and the writer connection"""
+        with self._readers_lock:
+            self._reader_path = None
+            while True:
+                try:
+                    self._readers.get_nowait().close()
+                except queue.Empty:
+                    break
+            self._readers_opened = 0
+        self.conn.close()
+    
+    async def aget_tuple(self, config):
+        """Read a checkpoint on a worker thread using a pooled reader connection"""
+        return await asyncio.to_thread(self.get_tuple, config)
+    
+    async def aput_writes(self, config, writes, task_id):
+        """Persist pending writes through the writer connection"""
+        async with self._write_lock:
+            return await asyncio.to_thread(self.put_writes, config, writes, task_id)
         
-        if self.stream_callback and checkpoint.channel_values:
-            state_data = checkpoint.channel_values
-            
-            # Emit state update event (safely handle both dict and object formats)
-            workflow_id = None
-            if isinstance(state_data, dict):
-                workflow_id = state_data.get("workflow_id")
-            else:
-                workflow_id = getattr(state_data, "workflow_id", None)
+    async def aput(self, config, checkpoint: Checkpoint, metadata: dict, new_versions=None):
+        """Override to emit AG-UI events when state is saved"""
+        async with self._write_lock:
+            result = await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+        
+        state_data = checkpoint.get("channel_values")
+        if self.stream_callback and state_data:
+            # channel_values has the same shape for every checkpoint, so pick the accessor once
+            if self._state_fields is None:
+                self._state_fields = _dict_state_fields if isinstance(state_data, dict) else _attr_state_fields
+            workflow_id, current_step, status = self._state_fields(state_data)
             
             if workflow_id:
                 event_data = {
                     "workflow_id": workflow_id,
-                    "current_step": state_data.get("current_step") if isinstance(state_data, dict) else getattr(state_data, "current_step", "unknown"),
-                    "status": state_data.get("status") if isinstance(state_data, dict) else getattr(state_data, "status", "unknown"),
-                    "timestamp": datetime.now().isoformat()
+                    "current_step": current_step,
+                    "status": status,
+                    "timestamp": _now_iso()
                 }
                 
                 try:
@@ -90,179 +259,191 @@ class AGUIStreamingCheckpointer(SqliteSaver):
             
         return result
 
-class AGUIDocumentProcessor:
-    """LangGraph processor with native AG-UI event emission"""
-    
-    def __init__(self, stream_callback=None):
-        self.llm = ChatOpenAI(
+_shared_llm: Optional[ChatOpenAI] = None
+
+def _get_shared_llm() -> ChatOpenAI:
+    """Lazily create the ChatOpenAI client reused by every workflow (keeps HTTP connections warm)"""
+    global _shared_llm
+    if _shared_llm is None:
+        _shared_llm = ChatOpenAI(
             model=os.getenv("OPENROUTER_MODEL", "deepseek/deepseek-chat-v3.1:free"),
             temperature=0,
             api_key=os.getenv("OPENROUTER_API_KEY"),
             base_url="https://openrouter.ai/api/v1"
         )
+    return _shared_llm
+
+class AGUIDocumentProcessor:
+    """LangGraph processor with native AG-UI event emission"""
+    
+    def __init__(self, stream_callback=None):
+        self.llm = _get_shared_llm()
         self.stream_callback = stream_callback
+        # Batch callers pass no callback; call sites skip building event payloads
+        self._streaming = stream_callback is not None
+        self._pending_text: List[str] = []
+        self._pending_text_workflow: Optional[str] = None
+        self._text_flush_scheduled = False
+        self._text_flush_task: Optional[asyncio.Task] = None
+        # Serializes text sends so a background flush never reorders against an inline one
+        self._text_lock = asyncio.Lock()
     
     async def _emit_event(self, event_type: str, data: Dict[str, Any]):
         """Emit AG-UI event if callback is available"""
-        if self.stream_callback:
+        if self._streaming:
+            # Keep buffered text ahead of any other event
+            await self._flush_text()
             await self.stream_callback(event_type, data)
     
+    async def _emit_text(self, content: str, workflow_id: str):
+        """Buffer a TEXT_MESSAGE_CHUNK; back-to-back chunks are sent as one event"""
+        if not self._streaming:
+            return
+        if self._pending_text and workflow_id != self._pending_text_workflow:
+            await self._flush_text()
+        
+        self._pending_text.append(content)
+        self._pending_text_workflow = workflow_id
+        if not self._text_flush_scheduled:
+            self._text_flush_scheduled = True
+            asyncio.get_running_loop().call_soon(self._schedule_text_flush)
+    
+    def _schedule_text_flush(self):
+        """Runs once the node yields to the event loop; at most one flush task is in flight"""
+        self._text_flush_scheduled = False
+        if self._text_flush_task is None or self._text_flush_task.done():
+            self._text_flush_task = asyncio.ensure_future(self._drain_text())
+    
+    async def _drain_text(self):
+        """Background flush that also picks up text buffered while a send was in flight"""
+        while self._pending_text:
+            await self._flush_text()
+    
+    async def _flush_text(self):
+        """Send all buffered text as a single TEXT_MESSAGE_CHUNK"""
+        async with self._text_lock:
+            if not self._pending_text:
+                return
+            content = "".join(self._pending_text)
+            workflow_id = self._pending_text_workflow
+            self._pending_text = []
+            await self.stream_callback("TEXT_MESSAGE_CHUNK", {
+                "content": content,
+                "workflow_id": workflow_id
+            })
+    
     async def intake_node(self, state: AGUIWorkflowState) -> AGUIWorkflowState:
         """Initialize workflow with AG-UI events"""
-        await self._emit_event("TEXT_MESSAGE_CHUNK", {
-            "content": f"🔄 Starting document processing...\n",
-            "workflow_id": state["workflow_id"]
-        })
+        current_time = _now_iso()
         
-        current_time = datetime.now().isoformat()
+        await self._emit_text(f"🔄 Starting document processing...\n", state["workflow_id"])
         
         # Update state
         state["current_step"] = "intake"
         state["status"] = "processing"
-        state["workflow_history"].append(f"Document received at {current_time}")
+        _append_history(state, f"Document received at {current_time}")
         state["updated_at"] = current_time
         
-        await self._emit_event("TEXT_MESSAGE_CHUNK", {
-            "content": f"📄 Document ID: {state['workflow_id']}\n",
-            "workflow_id": state["workflow_id"]
-        })
-        
-        await self._emit_event("TEXT_MESSAGE_CHUNK", {
-            "content": f"📊 Content length: {len(state['document_content'])} characters\n",
-            "workflow_id": state["workflow_id"]
-        })
+        if self._streaming:
+            await self._emit_text(f"📄 Document ID: {state['workflow_id']}\n", state["workflow_id"])
+            await self._emit_text(f"📊 Content length: {len(state['document_content'])} characters\n", state["workflow_id"])
         
         print(f"[AG-UI] Processing document {state['workflow_id']}")
+        await self._flush_text()
         return state
     
     async def extract_data_node(self, state: AGUIWorkflowState) -> AGUIWorkflowState:
         """Extract data with real-time progress updates"""
         workflow_id = state["workflow_id"]
-        current_time = datetime.now().isoformat()
+        current_time = _now_iso()
         
-        await self._emit_event("TEXT_MESSAGE_CHUNK", {
-            "content": "🔍 Analyzing document structure...\n",
-            "workflow_id": workflow_id
-        })
+        await self._emit_text("🔍 Analyzing document structure...\n", workflow_id)
         
         # Update step
         state["current_step"] = "extract_data"
         state["updated_at"] = current_time
         
-        extraction_prompt = """
-        You are a document processing assistant. Extract the following information from the given document text:
-        
-        For invoices:
-        - vendor_name: The name of the vendor/company
-        - invoice_id: The invoice number or ID
-        - due_date: The payment due date
-        - total_amount: The total amount due (as a number)
-        
-        For customer support tickets:
-        - customer_name: Customer's name
-        - email: Customer's email
-        - topic: Main topic/category
-        - sentiment: Customer sentiment (Happy, Neutral, Frustrated, Irate)
-        - urgency: Urgency level (Low, Medium, High, Critical)
-        
-        Return the extracted data as a JSON object. If you cannot find a field, set it to null.
-        If the document doesn't clearly match either category, try to extract whatever structured information you can.
-        """
-        
         try:
-            await self._emit_event("TEXT_MESSAGE_CHUNK", {
-                "content": "🤖 Calling LLM for data extraction...\n",
-                "workflow_id": workflow_id
-            })
+            await self._emit_text("🤖 Calling LLM for data extraction...\n", workflow_id)
             
             messages = [
-                SystemMessage(content=extraction_prompt),
+                _EXTRACTION_SYSTEM_MSG,
                 HumanMessage(content=f"Document content:\n{state['document_content']}")
             ]
             
-            # Make LLM call
-            response = self.llm.invoke(messages)
+            if self._streaming:
+                # Stream the LLM response, forwarding tokens as they arrive
+                response_parts = []
+                async for chunk in self.llm.astream(messages):
+                    if chunk.content:
+                        response_parts.append(chunk.content)
+                        await self._emit_text(chunk.content, workflow_id)
+                response_content = "".join(response_parts)
+            else:
+                response = await self.llm.ainvoke(messages)
+                response_content = response.content
             
-            await self._emit_event("TEXT_MESSAGE_CHUNK", {
-                "content": "📝 Processing LLM response...\n",
-                "workflow_id": workflow_id
-            })
+            await self._emit_text("\n📝 Processing LLM response...\n", workflow_id)
             
             # Parse JSON response
             try:
-                extracted_data = json.loads(response.content)
+                extracted_data = _loads(response_content)
                 
                 # Count extracted fields
                 field_count = len([v for v in extracted_data.values() if v is not None])
                 
-                await self._emit_event("TEXT_MESSAGE_CHUNK", {
-                    "content": f"✅ Successfully extracted {field_count} data fields\n",
-                    "workflow_id": workflow_id
-                })
+                if self._streaming:
+                    await self._emit_text(f"✅ Successfully extracted {field_count} data fields\n", workflow_id)
                 
             except json.JSONDecodeError:
                 # Fallback JSON parsing
-                import re
-                json_match = re.search(r'\{.*\}', response.content, re.DOTALL)
-                if json_match:
-                    extracted_data = json.loads(json_match.group())
-                    await self._emit_event("TEXT_MESSAGE_CHUNK", {
-                        "content": "⚠️ Used fallback JSON parsing\n",
-                        "workflow_id": workflow_id
-                    })
+                extracted_data = _extract_json_object(response_content)
+                if extracted_data is not None:
+                    await self._emit_text("⚠️ Used fallback JSON parsing\n", workflow_id)
                 else:
                     extracted_data = {"error": "Failed to parse LLM response as JSON"}
-                    await self._emit_event("TEXT_MESSAGE_CHUNK", {
-                        "content": "❌ Failed to parse LLM response\n",
-                        "workflow_id": workflow_id
-                    })
+                    await self._emit_text("❌ Failed to parse LLM response\n", workflow_id)
             
             # Update state
             state["extracted_data"] = extracted_data
-            state["workflow_history"].append(f"Data extracted at {current_time}")
+            _append_history(state, f"Data extracted at {current_time}")
             
             # Emit structured data event
-            await self._emit_event("TOOL_CALL_CHUNK", {
-                "tool_call_id": f"extract_data_{workflow_id}",
-                "tool_name": "document_extractor",
-                "arguments": json.dumps(extracted_data),
-                "workflow_id": workflow_id
-            })
+            if self._streaming:
+                await self._emit_event("TOOL_CALL_CHUNK", {
+                    "tool_call_id": f"extract_data_{workflow_id}",
+                    "tool_name": "document_extractor",
+                    "arguments": _dumps(extracted_data),
+                    "workflow_id": workflow_id
+                })
             
             print(f"[AG-UI] Extracted data for {workflow_id}: {extracted_data}")
             
         except Exception as e:
             error_msg = f"Error during extraction: {str(e)}"
             
-            await self._emit_event("TEXT_MESSAGE_CHUNK", {
-                "content": f"❌ ERROR: {error_msg}\n",
-                "workflow_id": workflow_id
-            })
+            if self._streaming:
+                await self._emit_text(f"❌ ERROR: {error_msg}\n", workflow_id)
             
             state["extracted_data"] = {"error": error_msg}
             state["status"] = "error"
-            state["workflow_history"].append(f"Extraction failed at {current_time}: {error_msg}")
+            _append_history(state, f"Extraction failed at {current_time}: {error_msg}")
             
-            await self._emit_event("RUN_ERROR", {
-                "error": error_msg,
-                "workflow_id": workflow_id
-            })
+            if self._streaming:
+                await self._emit_event("RUN_ERROR", {
+                    "error": error_msg,
+                    "workflow_id": workflow_id
+                })
             
             print(f"[AG-UI] Error extracting data from {workflow_id}: {error_msg}")
         
+        await self._flush_text()
         return state
     
-    def validation_router(self, state: AGUIWorkflowState) -> str:
-        """Route workflow based on validation rules"""
-        workflow_id = state["workflow_id"]
-        extracted_data = state.get("extracted_data", {})
-        
-        print(f"[AG-UI] Validating document {workflow_id}")
-        
-        # Basic validation
+    def _compute_review_reasons(self, extracted_data: Optional[Dict[str, Any]]) -> List[str]:
+        """Apply the validation rules and return every reason a document needs review"""
         if not extracted_data or "error" in extracted_data:
-            print(f"[AG-UI] Document {workflow_id} requires review: Missing or invalid data")
-            return "await_human_review"
+            return ["Missing or invalid extracted data"]
         
         reasons = []
         
@@ -277,7 +458,7 @@ class AGUIDocumentProcessor:
             amount = extracted_data.get("total_amount")
             if amount:
                 try:
-                    numeric_amount = float(str(amount).replace("$", "").replace(",", ""))
+                    numeric_amount = _to_amount(amount)
                     if numeric_amount > 1000:
                         reasons.append("Amount exceeds $1000 threshold")
                 except (ValueError, TypeError):
@@ -285,8 +466,8 @@ class AGUIDocumentProcessor:
         
         # Customer support validation
         elif "sentiment" in extracted_data:
-            sentiment = extracted_data.get("sentiment", "").lower()
-            topic = extracted_data.get("topic", "").lower()
+            sentiment = (extracted_data.get("sentiment") or "").lower()
+            topic = (extracted_data.get("topic") or "").lower()
             
             if sentiment == "irate":
                 reasons.append("Customer sentiment is irate")
@@ -296,62 +477,39 @@ class AGUIDocumentProcessor:
         # Generic validation - check for missing fields
         else:
             empty_fields = [k for k, v in extracted_data.items() if v is None or v == ""]
-            if empty_fields:
-                reasons.extend([f"Missing field: {field}" for field in empty_fields])
+            reasons.extend([f"Missing field: {field}" for field in empty_fields])
+        
+        return reasons
+    
+    async def validate_node(self, state: AGUIWorkflowState) -> AGUIWorkflowState:
+        """Evaluate validation rules once and store the review reasons in state"""
+        workflow_id = state["workflow_id"]
+        
+        print(f"[AG-UI] Validating document {workflow_id}")
+        
+        reasons = self._compute_review_reasons(state.get("extracted_data"))
+        state["review_reasons"] = reasons
         
         if reasons:
             print(f"[AG-UI] Document {workflow_id} requires review: {'; '.join(reasons)}")
-            return "await_human_review"
-        
-        print(f"[AG-UI] Document {workflow_id} passed validation")
-        return "finalize"
+        else:
+            print(f"[AG-UI] Document {workflow_id} passed validation")
+        return state
+    
+    def validation_router(self, state: AGUIWorkflowState) -> str:
+        """Route workflow based on the reasons computed by validate_node"""
+        return "await_human_review" if state.get("review_reasons") else "finalize"
     
     async def await_human_review_node(self, state: AGUIWorkflowState) -> AGUIWorkflowState:
         """Pause workflow for human review with interactive UI"""
         workflow_id = state["workflow_id"]
-        current_time = datetime.now().isoformat()
+        current_time = _now_iso()
         
-        await self._emit_event("TEXT_MESSAGE_CHUNK", {
-            "content": "⏸️ Workflow requires human review\n",
-            "workflow_id": workflow_id
-        })
+        await self._emit_text("⏸️ Workflow requires human review\n", workflow_id)
         
-        # Calculate review reasons
+        # Review reasons were computed by validate_node
         extracted_data = state.get("extracted_data", {})
-        reasons = []
-        
-        if not extracted_data or "error" in extracted_data:
-            reasons.append("Missing or invalid extracted data")
-        else:
-            # Check specific validation rules
-            if "total_amount" in extracted_data:
-                if not extracted_data.get("vendor_name"):
-                    reasons.append("Missing vendor name")
-                if not extracted_data.get("invoice_id"):
-                    reasons.append("Missing invoice ID")
-                    
-                amount = extracted_data.get("total_amount")
-                if amount:
-                    try:
-                        numeric_amount = float(str(amount).replace("$", "").replace(",", ""))
-                        if numeric_amount > 1000:
-                            reasons.append("Amount exceeds $1000 threshold")
-                    except (ValueError, TypeError):
-                        reasons.append("Invalid amount format")
-            
-            elif "sentiment" in extracted_data:
-                sentiment = extracted_data.get("sentiment", "").lower()
-                topic = extracted_data.get("topic", "").lower()
-                
-                if sentiment == "irate":
-                    reasons.append("Customer sentiment is irate")
-                if "security" in topic or "vulnerability" in topic:
-                    reasons.append("Security-related issue")
-            
-            else:
-                empty_fields = [k for k, v in extracted_data.items() if v is None or v == ""]
-                if empty_fields:
-                    reasons.extend([f"Missing field: {field}" for field in empty_fields])
+        reasons = state.get("review_reasons") or []
         
         reason_text = "; ".join(reasons) if reasons else "Unknown validation issue"
         
@@ -360,33 +518,31 @@ class AGUIDocumentProcessor:
         state["status"] = "pending_review"
         state["human_review_required"] = True
         state["reason_for_review"] = reason_text
-        state["workflow_history"].append(f"Paused for review at {current_time}: {reason_text}")
+        _append_history(state, f"Paused for review at {current_time}: {reason_text}")
         state["updated_at"] = current_time
         
-        # Emit review reasons
-        await self._emit_event("TEXT_MESSAGE_CHUNK", {
-            "content": f"📋 Review needed: {reason_text}\n",
-            "workflow_id": workflow_id
-        })
-        
-        # Emit interactive review component
-        await self._emit_event("GENERATIVE_UI", {
-            "component": "DataReviewForm",
-            "props": {
+        if self._streaming:
+            # Emit review reasons
+            await self._emit_text(f"📋 Review needed: {reason_text}\n", workflow_id)
+            
+            # Emit interactive review component
+            await self._emit_event("GENERATIVE_UI", {
+                "component": "DataReviewForm",
+                "props": {
+                    "workflow_id": workflow_id,
+                    "extracted_data": extracted_data,
+                    "reasons": reasons,
+                    "review_url": f"/api/workflows/{workflow_id}/approve"
+                },
+                "workflow_id": workflow_id
+            })
+            
+            # Emit human input required event
+            await self._emit_event("HUMAN_INPUT_REQUIRED", {
                 "workflow_id": workflow_id,
-                "extracted_data": extracted_data,
                 "reasons": reasons,
-                "review_url": f"/api/workflows/{workflow_id}/approve"
-            },
-            "workflow_id": workflow_id
-        })
-        
-        # Emit human input required event
-        await self._emit_event("HUMAN_INPUT_REQUIRED", {
-            "workflow_id": workflow_id,
-            "reasons": reasons,
-            "extracted_data": extracted_data
-        })
+                "extracted_data": extracted_data
+            })
         
         print(f"[AG-UI] Document {workflow_id} awaiting human review: {reason_text}")
         return state
@@ -394,18 +550,15 @@ class AGUIDocumentProcessor:
     async def finalize_node(self, state: AGUIWorkflowState) -> AGUIWorkflowState:
         """Finalize workflow with completion events"""
         workflow_id = state["workflow_id"]
-        current_time = datetime.now().isoformat()
+        current_time = _now_iso()
         
-        await self._emit_event("TEXT_MESSAGE_CHUNK", {
-            "content": "🎯 Finalizing workflow...\n",
-            "workflow_id": workflow_id
-        })
+        await self._emit_text("🎯 Finalizing workflow...\n", workflow_id)
         
         # Update state
         state["current_step"] = "finalize"
         state["status"] = "finalized"
         state["human_review_required"] = False
-        state["workflow_history"].append(f"Workflow finalized at {current_time}")
+        _append_history(state, f"Workflow finalized at {current_time}")
         state["updated_at"] = current_time
         
         # Save results to file
@@ -417,26 +570,24 @@ class AGUIDocumentProcessor:
             "finalized_at": current_time
         }
         
-        with open(output_file, 'w') as f:
-            json.dump(output_data, f, indent=2)
-        
-        await self._emit_event("TEXT_MESSAGE_CHUNK", {
-            "content": f"💾 Results saved to {output_file}\n",
-            "workflow_id": workflow_id
-        })
+        def _write_output():
+            with open(output_file, 'wb') as f:
+                f.write(_dumps_pretty(output_data))
         
-        await self._emit_event("TEXT_MESSAGE_CHUNK", {
-            "content": "✅ Workflow completed successfully!\n",
-            "workflow_id": workflow_id
-        })
+        # Write off the event loop so other workflows keep streaming
+        await asyncio.to_thread(_write_output)
         
-        # Final completion event
-        await self._emit_event("RUN_FINISHED", {
-            "workflow_id": workflow_id,
-            "status": "completed",
-            "final_data": state["extracted_data"],
-            "output_file": output_file
-        })
+        if self._streaming:
+            await self._emit_text(f"💾 Results saved to {output_file}\n", workflow_id)
+            await self._emit_text("✅ Workflow completed successfully!\n", workflow_id)
+            
+            # Final completion event
+            await self._emit_event("RUN_FINISHED", {
+                "workflow_id": workflow_id,
+                "status": "completed",
+                "final_data": state["extracted_data"],
+                "output_file": output_file
+            })
         
         print(f"[AG-UI] Document {workflow_id} processing completed successfully")
         return state
@@ -445,10 +596,69 @@ class AGUILangGraphWorkflow:
     """Main workflow class that integrates LangGraph with AG-UI streaming"""
     
     def __init__(self):
-        self.processor = None
-        self.checkpointer = None
-        self.app = None
-        self.current_stream_callback = None
+        # Used by runs without a stream callback (e.g. resume_workflow)
+        self.processor = AGUIDocumentProcessor()
+        self._stream_callbacks: Dict[str, Any] = {}
+        self._db_path: Optional[str] = None
+        self._wal_task: Optional[asyncio.Task] = None
+        self.checkpointer = self.setup_database()
+        
+        # Compile once; per-run callbacks travel in the config instead of the graph
+        self.app = self.create_workflow().compile(
+            checkpointer=self.checkpointer,
+            interrupt_after=["await_human_review"]
+        )
+    
+    def close(self):
+        """Stop WAL checkpointing and close the checkpoint connections"""
+        if self._wal_task is not None:
+            self._wal_task.cancel()
+            self._wal_task = None
+        self.checkpointer.close()
+    
+    def _ensure_wal_checkpointer(self):
+        """Start the background WAL checkpoint task (needs a running loop, so not from __init__)"""
+        if self._db_path and (self._wal_task is None or self._wal_task.done()):
+            self._wal_task = asyncio.create_task(self._wal_checkpoint_loop())
+    
+    async def _wal_checkpoint_loop(self):
+        """Keep the WAL short with PASSIVE checkpoints so SQLite never needs a blocking one"""
+        # A separate connection keeps checkpointing off the shared writer
+        conn = sqlite3.connect(self._db_path, check_same_thread=False)
+        try:
+            while True:
+                await asyncio.sleep(_WAL_CHECKPOINT_INTERVAL)
+                try:
+                    await asyncio.to_thread(conn.execute, "PRAGMA wal_checkpoint(PASSIVE)")
+                except sqlite3.Error as e:
+                    print(f"[AG-UI] Warning: WAL checkpoint failed: {e}")
+        finally:
+            conn.close()
+    
+    async def _route_state_update(self, event_type: str, data: Dict[str, Any]):
+        """Forward checkpointer events to the stream callback of the workflow they belong to"""
+        callback = self._stream_callbacks.get(data.get("workflow_id"))
+        if callback:
+            await callback(event_type, data)
+    
+    def _processor_for(self, config: RunnableConfig) -> AGUIDocumentProcessor:
+        """Return the processor carried in the run config, or the non-streaming default"""
+        return config.get("configurable", {}).get("processor") or self.processor
+    
+    async def _intake(self, state: AGUIWorkflowState, config: RunnableConfig) -> AGUIWorkflowState:
+        return await self._processor_for(config).intake_node(state)
+    
+    async def _extract_data(self, state: AGUIWorkflowState, config: RunnableConfig) -> AGUIWorkflowState:
+        return await self._processor_for(config).extract_data_node(state)
+    
+    async def _validate(self, state: AGUIWorkflowState, config: RunnableConfig) -> AGUIWorkflowState:
+        return await self._processor_for(config).validate_node(state)
+    
+    async def _await_human_review(self, state: AGUIWorkflowState, config: RunnableConfig) -> AGUIWorkflowState:
+        return await self._processor_for(config).await_human_review_node(state)
+    
+    async def _finalize(self, state: AGUIWorkflowState, config: RunnableConfig) -> AGUIWorkflowState:
+        return await self._processor_for(config).finalize_node(state)
     
     def setup_database(self) -> AGUIStreamingCheckpointer:
         """Initialize AG-UI compatible checkpointer"""
@@ -456,13 +666,21 @@ class AGUILangGraphWorkflow:
         db_path = "./checkpoints/agui_workflow.db"
         
         try:
-            conn = sqlite3.connect(db_path, check_same_thread=False)
-            return AGUIStreamingCheckpointer(conn, self.current_stream_callback)
+            # The writer is shared across worker threads (guarded by the saver's
+            # lock); its implicit transactions start with BEGIN IMMEDIATE so it
+            # takes the write lock up front instead of escalating later
+            conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level="IMMEDIATE")
+            try:
+                conn.executescript(_SQLITE_PRAGMAS)
+            except sqlite3.DatabaseError as e:
+                print(f"Warning: Could not apply SQLite tuning, using defaults: {e}")
+            self._db_path = db_path
+            return AGUIStreamingCheckpointer(conn, self._route_state_update, reader_path=db_path)
         except Exception as e:
             print(f"Warning: Database setup issue: {e}")
-            # Fallback to in-memory
+            # Fallback to in-memory (a private database, so no readers)
             conn = sqlite3.connect(":memory:", check_same_thread=False)
-            return AGUIStreamingCheckpointer(conn, self.current_stream_callback)
+            return AGUIStreamingCheckpointer(conn, self._route_state_update)
     
     def create_workflow(self) -> StateGraph:
         """Create LangGraph workflow with AG-UI integration"""
@@ -470,19 +688,21 @@ class AGUILangGraphWorkflow:
         # Create the state graph
         workflow = StateGraph(AGUIWorkflowState)
         
-        # Add nodes (processor will be set with stream callback)
-        workflow.add_node("intake", self.processor.intake_node)
-        workflow.add_node("extract_data", self.processor.extract_data_node)
-        workflow.add_node("await_human_review", self.processor.await_human_review_node)
-        workflow.add_node("finalize", self.processor.finalize_node)
+        # Add nodes (each resolves the run's processor from its config)
+        workflow.add_node("intake", self._intake)
+        workflow.add_node("extract_data", self._extract_data)
+        workflow.add_node("validate", self._validate)
+        workflow.add_node("await_human_review", self._await_human_review)
+        workflow.add_node("finalize", self._finalize)
         
         # Set entry point
         workflow.set_entry_point("intake")
         
         # Add edges
         workflow.add_edge("intake", "extract_data")
+        workflow.add_edge("extract_data", "validate")
         workflow.add_conditional_edges(
-            "extract_data",
+            "validate",
             self.processor.validation_router,
             {
                 "await_human_review": "await_human_review",
@@ -494,14 +714,7 @@ class AGUILangGraphWorkflow:
         workflow.add_edge("finalize", END)
         
         # After human review, re-validate
-        workflow.add_conditional_edges(
-            "await_human_review", 
-            self.processor.validation_router,
-            {
-                "await_human_review": "await_human_review",  # Still needs review
-                "finalize": "finalize"  # Can now finalize
-            }
-        )
+        workflow.add_edge("await_human_review", "validate")
         
         return workflow
     
@@ -515,29 +728,26 @@ class AGUILangGraphWorkflow:
         if workflow_id is None:
             workflow_id = str(uuid.uuid4())
         
-        # Create event queue for streaming
-        event_queue = asyncio.Queue()
+        self._ensure_wal_checkpointer()
+        
+        # Bounded event queue between the graph and this generator
+        event_queue = asyncio.Queue(maxsize=_EVENT_QUEUE_SIZE)
+        consumer_closed = False
         
         # Stream callback to capture events from nodes
         async def stream_callback(event_type: str, data: Dict[str, Any]):
             event = AgentResponse(
                 type=event_type,
                 data=data,
-                timestamp=datetime.now().isoformat(),
+                timestamp=_now_iso(),
                 workflow_id=workflow_id
             )
-            await event_queue.put(event)
-        
-        # Set up processor and workflow with streaming
-        self.current_stream_callback = stream_callback
-        self.processor = AGUIDocumentProcessor(stream_callback)
-        self.checkpointer = self.setup_database()
-        
-        workflow = self.create_workflow()
-        self.app = workflow.compile(
-            checkpointer=self.checkpointer,
-            interrupt_after=["await_human_review"]
-        )
+            if consumer_closed:
+                return
+            try:
+                event_queue.put_nowait(event)
+            except asyncio.QueueFull:
+                await event_queue.put(event)
         
         # Emit workflow start event
         start_event = AgentResponse(
@@ -547,12 +757,13 @@ class AGUILangGraphWorkflow:
                 "agent_name": "LangGraph Document Processor",
                 "document_length": len(document_content)
             },
-            timestamp=datetime.now().isoformat(),
+            timestamp=_now_iso(),
             workflow_id=workflow_id
         )
         yield start_event
         
         # Initial state
+        started_at = _now_iso()
         initial_state = AGUIWorkflowState(
             workflow_id=workflow_id,
             document_content=document_content,
@@ -561,16 +772,20 @@ class AGUILangGraphWorkflow:
             status="received",
             human_review_required=False,
             reason_for_review=None,
-            stream_callback=stream_callback,
+            review_reasons=[],
             workflow_history=[],
-            created_at=datetime.now().isoformat(),
-            updated_at=datetime.now().isoformat()
+            created_at=started_at,
+            updated_at=started_at
         )
         
-        config = {"configurable": {"thread_id": workflow_id}}
+        config = {"configurable": {
+            "thread_id": workflow_id,
+            "processor": AGUIDocumentProcessor(stream_callback)
+        }}
         
         # Start workflow execution in background
         async def run_workflow():
+            self._stream_callbacks[workflow_id] = stream_callback
             try:
                 async for state_chunk in self.app.astream(initial_state, config):
                     # LangGraph streaming - each chunk represents node completion
@@ -590,8 +805,10 @@ class AGUILangGraphWorkflow:
                     "error": str(e)
                 })
             finally:
+                self._stream_callbacks.pop(workflow_id, None)
                 # Signal completion
-                await event_queue.put(None)
+                if not consumer_closed:
+                    await event_queue.put(_STREAM_EOF)
         
         # Start workflow task
         workflow_task = asyncio.create_task(run_workflow())
@@ -600,7 +817,7 @@ class AGUILangGraphWorkflow:
         try:
             while True:
                 event = await event_queue.get()
-                if event is None:  # End marker
+                if event is _STREAM_EOF:
                     break
                 yield event
                 
@@ -609,10 +826,16 @@ class AGUILangGraphWorkflow:
             error_event = AgentResponse(
                 type="RUN_ERROR",
                 data={"error": str(e), "workflow_id": workflow_id},
-                timestamp=datetime.now().isoformat(),
+                timestamp=_now_iso(),
                 workflow_id=workflow_id
             )
             yield error_event
+        finally:
+            if not workflow_task.done():
+                # Client stopped reading: let the graph finish without blocking on the queue
+                consumer_closed = True
+                while not event_queue.empty():
+                    event_queue.get_nowait()
         
         # Wait for workflow completion
         try:
@@ -653,8 +876,9 @@ class AGUILangGraphWorkflow:
                 if "extracted_data" in new_state and isinstance(new_state["extracted_data"], dict):
                     new_state["extracted_data"].update(updated_data)
                 
-                new_state["workflow_history"].append(f"Human review completed at {datetime.now().isoformat()}")
-                new_state["updated_at"] = datetime.now().isoformat()
+                current_time = _now_iso()
+                _append_history(new_state, f"Human review completed at {current_time}")
+                new_state["updated_at"] = current_time
                 new_state["human_review_required"] = False
                 
                 # Update the state
@@ -6,24 +6,46 @@ This server wraps the existing LangGraph workflow with AG-UI compatible API.
 import os
 import json
 import uuid
+import secrets
 import asyncio
+import itertools
 from datetime import datetime
 from typing import AsyncGenerator, Dict, Any, List, Optional
 from contextlib import asynccontextmanager
+from dataclasses import dataclass
 
-from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect, Request, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipMiddleware, GZipResponder
+from fastapi.responses import StreamingResponse, JSONResponse, ORJSONResponse
 from pydantic import BaseModel
 import uvicorn
 
+try:
+    import orjson
+except ImportError:
+    # Optional speedup; fall back to the stdlib json module
+    orjson = None
+
+try:
+    import uvloop
+except ImportError:
+    # Optional: libuv-backed event loop, not available on Windows
+    uvloop = None
+
 # Import existing workflow components
-import sys
-import os
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from backend.engine import DocumentProcessor, create_workflow, setup_database
-from shared.types import AgentState, WorkflowStatus, DocumentExtractedData, ValidationResult, WorkflowEvent
-from shared.database import WorkflowDatabase
+from shared.types import AgentResponse, AgentState, WorkflowStatus, DocumentExtractedData, ValidationResult, WorkflowEvent
+from shared.database import WorkflowDatabase, WriterActor
+from shared.serialization import dumps as _dumps, now_iso as _now_iso, sse_frame as _sse_frame
+
+
+# Seconds of silence before a KEEPALIVE event is sent on the AG-UI stream
+_KEEPALIVE_INTERVAL = 15
+
+# SSE comment frame sent during idle periods
+_SSE_KEEPALIVE = b": keepalive\n\n"
 
 
 class Message(BaseModel):
@@ -35,200 +57,239 @@ class RunRequest(BaseModel):
     tools: Optional[List[Dict]] = []
     state: Optional[Dict] = {}
 
-class AgentResponse(BaseModel):
-    type: str
-    data: Dict[str, Any]
-    timestamp: str
-    workflow_id: Optional[str] = None
+# Validation rules as (check, reason) pairs, selected by document shape in validate_data
+_INVOICE_RULES = [
+    (lambda d: not d.get("vendor_name"), "Missing vendor name"),
+    (lambda d: not d.get("invoice_id"), "Missing invoice ID"),
+    (lambda d: bool(d.get("total_amount")) and float(d["total_amount"]) > 1000, "Amount exceeds $1000 threshold"),
+]
+
+_SECURITY_KEYWORDS = ("security", "vulnerability")
+
+# Support ticket rules expect sentiment/topic already lower-cased
+_SUPPORT_TICKET_RULES = [
+    (lambda d: d["sentiment"] == "irate", "Customer sentiment is irate"),
+    (lambda d: any(k in d["topic"] for k in _SECURITY_KEYWORDS), "Security-related issue"),
+]
+
+def _extracted_dict(state: AgentState) -> Dict[str, Any]:
+    """Return state.extracted_data as a dict, dumping it only when the model object changes"""
+    source, data = state._extracted_cache
+    if source is not state.extracted_data:
+        data = state.extracted_data.model_dump() if state.extracted_data else {}
+        state._extracted_cache = (state.extracted_data, data)
+    return data
+
+# Constant part of every streamed text chunk
+_TEXT_CHUNK_TEMPLATE = {"type": "TEXT_MESSAGE_CHUNK"}
+
+@dataclass
+class RunCtx:
+    """IDs for a single agent run, threaded through the streaming methods"""
+    workflow_id: str
+    message_id: str
 
 class DocumentWorkflowAgent:
     """AG-UI compatible document workflow agent"""
     
-    def __init__(self):
+    def __init__(self, db: Optional[WorkflowDatabase] = None):
         self.legacy_processor = DocumentProcessor()
-        self.db = WorkflowDatabase()
-        self.current_workflow_id = None
-        self.current_message_id = None
+        self.db = db  # Shared instance, bound in lifespan
+        self.writer = WriterActor()  # Sole writer; started in lifespan
+    
+    async def _save(self, state: AgentState) -> None:
+        """Save agent state through the writer so streams keep flowing"""
+        return await self.writer.submit(self.db.save_agent_state, state)
     
-    def create_event(self, event_type: str, data: Dict[str, Any]) -> AgentResponse:
-        """Create AG-UI protocol event"""
+    async def _add_event(self, event: WorkflowEvent) -> None:
+        """Record a workflow event through the writer"""
+        return await self.writer.submit(self.db.add_workflow_event, event)
+    
+    async def _write_batch(
+        self,
+        state: AgentState,
+        events: Optional[List[WorkflowEvent]] = None,
+        review_reason: Optional[str] = None,
+        remove_from_queue: bool = False
+    ) -> None:
+        """Persist a state with its events and review-queue change in one transaction"""
+        return await self.writer.submit(
+            self.db.write_batch, state, events, review_reason, remove_from_queue
+        )
+    
+    async def _get_state(self, workflow_id: str) -> Optional[AgentState]:
+        """Load agent state on a worker thread"""
+        return await asyncio.to_thread(self.db.get_agent_state, workflow_id)
+    
+    def create_event(
+        self,
+        ctx: Optional[RunCtx],
+        event_type: str,
+        data: Dict[str, Any],
+        timestamp: Optional[str] = None
+    ) -> AgentResponse:
+        """Create AG-UI protocol event, optionally stamped with the caller's stage time"""
         return AgentResponse(
             type=event_type,
             data=data,
-            timestamp=datetime.now().isoformat(),
-            workflow_id=self.current_workflow_id
+            timestamp=timestamp or _now_iso(),
+            workflow_id=ctx.workflow_id if ctx else None
+        )
+    
+    def _text_event(self, ctx: RunCtx, content: str, timestamp: Optional[str] = None) -> AgentResponse:
+        """Build a TEXT_MESSAGE_CHUNK from the fixed skeleton, skipping model validation"""
+        return AgentResponse.model_construct(
+            **_TEXT_CHUNK_TEMPLATE,
+            data={"content": content, "message_id": ctx.message_id},
+            timestamp=timestamp or _now_iso(),
+            workflow_id=ctx.workflow_id
         )
     
     async def run(self, request: RunRequest) -> AsyncGenerator[AgentResponse, None]:
         """Main AG-UI run method - streams workflow execution"""
         
         # Extract document content from messages
-        document_content = ""
-        for message in request.messages:
-            if message.role == "user":
-                document_content += message.content + "\n"
+        document_content = "\n".join(m.content for m in request.messages if m.role == "user").strip()
         
-        if not document_content.strip():
-            yield self.create_event("RUN_ERROR", {
+        if not document_content:
+            yield self.create_event(None, "RUN_ERROR", {
                 "error": "No document content provided"
             })
             return
         
         # Initialize workflow
-        self.current_workflow_id = str(uuid.uuid4())[:8]
-        self.current_message_id = str(uuid.uuid4())
+        # Per-run IDs live in a context object so concurrent runs don't share them
+        ctx = RunCtx(workflow_id=secrets.token_hex(8), message_id=str(uuid.uuid4()))
         
         # Create initial agent state
+        now = datetime.now()
+        ts = _now_iso()
         agent_state = AgentState(
-            workflow_id=self.current_workflow_id,
+            workflow_id=ctx.workflow_id,
             status=WorkflowStatus.RECEIVED,
             current_step="initialization",
-            document_content=document_content.strip(),
-            created_at=datetime.now(),
-            updated_at=datetime.now()
+            document_content=document_content,
+            created_at=now,
+            updated_at=now
         )
         
-        # Save initial state
-        self.db.save_agent_state(agent_state)
-        
+        # Initial state is persisted by the intake stage
         # Emit RUN_STARTED
-        yield self.create_event("RUN_STARTED", {
-            "run_id": self.current_workflow_id,
+        yield self.create_event(ctx, "RUN_STARTED", {
+            "run_id": ctx.workflow_id,
             "agent_name": "Document Workflow Agent",
-            "workflow_id": self.current_workflow_id
-        })
+            "workflow_id": ctx.workflow_id
+        }, ts)
         
         try:
             # Stream the workflow execution
-            async for event in self.execute_workflow_stream(agent_state):
+            async for event in self.execute_workflow_stream(ctx, agent_state):
                 yield event
                 
         except Exception as e:
             # Handle errors
             error_event = WorkflowEvent(
-                workflow_id=self.current_workflow_id,
+                workflow_id=ctx.workflow_id,
                 event_type="ERROR",
                 data={"error": str(e)},
-                timestamp=datetime.now().isoformat(),
+                timestamp=_now_iso(),
                 step_name="error_handling"
             )
-            self.db.add_workflow_event(error_event)
+            await self._add_event(error_event)
             
-            yield self.create_event("RUN_ERROR", {
+            yield self.create_event(ctx, "RUN_ERROR", {
                 "error": str(e),
-                "workflow_id": self.current_workflow_id
+                "workflow_id": ctx.workflow_id
             })
     
-    async def execute_workflow_stream(self, state: AgentState) -> AsyncGenerator[AgentResponse, None]:
+    async def execute_workflow_stream(self, ctx: RunCtx, state: AgentState) -> AsyncGenerator[AgentResponse, None]:
         """Execute the workflow with streaming updates"""
         
         # Step 1: Document Intake
-        yield self.create_event("TEXT_MESSAGE_CHUNK", {
-            "content": f"Processing document {state.workflow_id}...\n",
-            "message_id": self.current_message_id
-        })
+        now = datetime.now()
+        ts = _now_iso()
+        yield self._text_event(ctx, f"Processing document {state.workflow_id}...\n", ts)
         
         # Update state
         state.status = WorkflowStatus.PROCESSING
         state.current_step = "intake"
-        state.updated_at = datetime.now()
-        self.db.save_agent_state(state)
-        
-        await asyncio.sleep(0.5)  # Simulate processing
+        state.updated_at = now
+        await self._save(state)
         
         # Step 2: Data Extraction
-        yield self.create_event("TEXT_MESSAGE_CHUNK", {
-            "content": "Extracting structured data using AI...\n",
-            "message_id": self.current_message_id
-        })
+        yield self._text_event(ctx, "Extracting structured data using AI...\n", ts)
         
         # Perform extraction
-        async for event in self.stream_data_extraction(state):
+        async for event in self.stream_data_extraction(ctx, state):
             yield event
         
-        # Update state with extracted data
-        state = self.db.get_agent_state(state.workflow_id)
-        
         # Step 3: Validation
-        yield self.create_event("TEXT_MESSAGE_CHUNK", {
-            "content": "Validating extracted data...\n",
-            "message_id": self.current_message_id
-        })
+        now = datetime.now()
+        ts = _now_iso()
+        yield self._text_event(ctx, "Validating extracted data...\n", ts)
         
         validation_result = await self.validate_data(state)
         
         # Update state with validation result
         state.validation_result = validation_result
-        state.updated_at = datetime.now()
-        self.db.save_agent_state(state)
+        state.updated_at = now
+        await self._save(state)
         
         # Step 4: Decision point
         if validation_result.needs_review:
             # Human review required
-            yield self.create_event("TEXT_MESSAGE_CHUNK", {
-                "content": f"WARNING: Document requires human review: {', '.join(validation_result.reasons)}\n",
-                "message_id": self.current_message_id
-            })
+            now = datetime.now()
+            ts = _now_iso()
+            yield self._text_event(ctx, f"WARNING: Document requires human review: {', '.join(validation_result.reasons)}\n", ts)
             
             # Create review UI component
-            yield self.create_event("GENERATIVE_UI", {
+            yield self.create_event(ctx, "GENERATIVE_UI", {
                 "component": "DocumentReview",
                 "props": {
                     "workflowId": state.workflow_id,
-                    "extractedData": state.extracted_data.model_dump() if state.extracted_data else {},
+                    "extractedData": _extracted_dict(state),
                     "reviewReasons": validation_result.reasons,
                     "originalContent": state.document_content,
                     "onApprove": {"action": "approve_document"},
                     "onReject": {"action": "reject_document"},
                     "onUpdate": {"action": "update_document_data"}
                 }
-            })
+            }, ts)
             
             # Mark as needing review
             state.status = WorkflowStatus.PENDING_REVIEW
             state.human_review_required = True
             state.current_step = "awaiting_review"
-            state.updated_at = datetime.now()
-            self.db.save_agent_state(state)
+            state.updated_at = now
             
-            # Add to review queue
-            self.db.add_to_review_queue(
-                state.workflow_id, 
-                "; ".join(validation_result.reasons)
-            )
+            # Save state and enqueue for review in one transaction
+            await self._write_batch(state, review_reason="; ".join(validation_result.reasons))
             
-            yield self.create_event("HUMAN_INPUT_REQUIRED", {
+            yield self.create_event(ctx, "HUMAN_INPUT_REQUIRED", {
                 "workflow_id": state.workflow_id,
                 "reasons": validation_result.reasons,
-                "extracted_data": state.extracted_data.model_dump() if state.extracted_data else {}
-            })
+                "extracted_data": _extracted_dict(state)
+            }, ts)
             
         else:
             # Auto-approve and finalize
-            yield self.create_event("TEXT_MESSAGE_CHUNK", {
-                "content": "SUCCESS: Document approved automatically. Finalizing...\n",
-                "message_id": self.current_message_id
-            })
+            yield self._text_event(ctx, "SUCCESS: Document approved automatically. Finalizing...\n")
             
             await self.finalize_workflow(state)
         
-        # Emit final status
-        final_state = self.db.get_agent_state(state.workflow_id)
-        status_value = final_state.status.value if hasattr(final_state.status, 'value') else str(final_state.status)
-        yield self.create_event("RUN_FINISHED", {
+        # Emit final status from the in-memory state; this run is its only writer
+        status_value = state.status.value if hasattr(state.status, 'value') else str(state.status)
+        yield self.create_event(ctx, "RUN_FINISHED", {
             "status": status_value,
-            "workflow_id": final_state.workflow_id,
-            "final_data": final_state.extracted_data.model_dump() if final_state.extracted_data else {}
+            "workflow_id": state.workflow_id,
+            "final_data": _extracted_dict(state)
         })
     
-    async def stream_data_extraction(self, state: AgentState) -> AsyncGenerator[AgentResponse, None]:
+    async def stream_data_extraction(self, ctx: RunCtx, state: AgentState) -> AsyncGenerator[AgentResponse, None]:
         """Stream the data extraction process"""
         
         # Simulate streaming LLM processing
-        yield self.create_event("TEXT_MESSAGE_CHUNK", {
-            "content": "Processing with DeepSeek model...\n",
-            "message_id": self.current_message_id
-        })
+        yield self._text_event(ctx, "Processing with DeepSeek model...\n")
         
         # Use legacy processor for actual extraction
         try:
@@ -244,8 +305,17 @@ class DocumentWorkflowAgent:
                 "updated_at": state.updated_at.isoformat()
             }
             
-            # Run extraction
-            result_state = self.legacy_processor.extract_data_node(legacy_state)
+            # Run extraction on a worker thread; the legacy LLM call is blocking
+            extraction = asyncio.create_task(
+                asyncio.to_thread(self.legacy_processor.extract_data_node, legacy_state)
+            )
+            # Keep idle proxies from closing the stream during long LLM calls
+            while True:
+                done, _ = await asyncio.wait({extraction}, timeout=_KEEPALIVE_INTERVAL)
+                if done:
+                    break
+                yield self.create_event(ctx, "KEEPALIVE", {})
+            result_state = extraction.result()
             
             # Convert back to AG-UI format
             extracted_data_dict = result_state.get("extracted_data", {})
@@ -254,35 +324,27 @@ class DocumentWorkflowAgent:
                 extracted_data = DocumentExtractedData(**extracted_data_dict)
                 
                 # Update agent state
+                now = datetime.now()
+                ts = _now_iso()
                 state.extracted_data = extracted_data
                 state.current_step = "extraction_complete"
-                state.updated_at = datetime.now()
-                self.db.save_agent_state(state)
+                state.updated_at = now
                 
                 # Emit extracted data as tool result
-                yield self.create_event("TOOL_CALL_CHUNK", {
+                yield self.create_event(ctx, "TOOL_CALL_CHUNK", {
                     "tool_call_id": "extract_data",
                     "tool_name": "document_extractor",
-                    "parent_message_id": self.current_message_id,
-                    "arguments": json.dumps(extracted_data_dict)
-                })
+                    "parent_message_id": ctx.message_id,
+                    "arguments": _dumps(extracted_data_dict)
+                }, ts)
                 
-                yield self.create_event("TEXT_MESSAGE_CHUNK", {
-                    "content": f"SUCCESS: Extracted {len(extracted_data_dict)} data fields\n",
-                    "message_id": self.current_message_id
-                })
+                yield self._text_event(ctx, f"SUCCESS: Extracted {len(extracted_data_dict)} data fields\n", ts)
             else:
                 # Extraction error
-                yield self.create_event("TEXT_MESSAGE_CHUNK", {
-                    "content": f"ERROR: Extraction error: {extracted_data_dict['error']}\n",
-                    "message_id": self.current_message_id
-                })
+                yield self._text_event(ctx, f"ERROR: Extraction error: {extracted_data_dict['error']}\n")
                 
         except Exception as e:
-            yield self.create_event("TEXT_MESSAGE_CHUNK", {
-                "content": f"ERROR: Extraction failed: {str(e)}\n",
-                "message_id": self.current_message_id
-            })
+            yield self._text_event(ctx, f"ERROR: Extraction failed: {str(e)}\n")
     
     async def validate_data(self, state: AgentState) -> ValidationResult:
         """Validate extracted data using legacy validation logic"""
@@ -296,43 +358,25 @@ class DocumentWorkflowAgent:
                 validation_rules_applied=["data_presence_check"]
             )
         
-        # Use legacy validation router logic
-        extracted_data = state.extracted_data.model_dump()
-        reasons = []
-        rules_applied = []
+        # Use legacy validation router logic; pick the rule set once by document shape
+        extracted_data = _extracted_dict(state)
         
-        # Invoice validation
         if extracted_data.get("total_amount") is not None:
-            rules_applied.append("invoice_validation")
-            
-            if not extracted_data.get("vendor_name"):
-                reasons.append("Missing vendor name")
-            
-            if not extracted_data.get("invoice_id"):
-                reasons.append("Missing invoice ID")
-            
-            amount = extracted_data.get("total_amount")
-            if amount and float(amount) > 1000:
-                reasons.append("Amount exceeds $1000 threshold")
+            rules_applied = ["invoice_validation"]
+            reasons = [reason for check, reason in _INVOICE_RULES if check(extracted_data)]
         
-        # Support ticket validation
         elif extracted_data.get("sentiment"):
-            rules_applied.append("support_ticket_validation")
-            
-            sentiment = extracted_data.get("sentiment", "").lower()
-            if sentiment == "irate":
-                reasons.append("Customer sentiment is irate")
-            
-            topic = extracted_data.get("topic", "").lower()
-            if "security" in topic or "vulnerability" in topic:
-                reasons.append("Security-related issue")
+            rules_applied = ["support_ticket_validation"]
+            # Lower-case the free-text fields once for every rule
+            normalized = {
+                "sentiment": extracted_data["sentiment"].lower(),
+                "topic": (extracted_data.get("topic") or "").lower()
+            }
+            reasons = [reason for check, reason in _SUPPORT_TICKET_RULES if check(normalized)]
         
-        # Generic validation
         else:
-            rules_applied.append("generic_validation")
-            empty_fields = [k for k, v in extracted_data.items() if v is None or v == ""]
-            if empty_fields:
-                reasons.extend([f"Missing field: {field}" for field in empty_fields])
+            rules_applied = ["generic_validation"]
+            reasons = [f"Missing field: {k}" for k, v in extracted_data.items() if v is None or v == ""]
         
         needs_review = len(reasons) > 0
         
@@ -352,21 +396,17 @@ class DocumentWorkflowAgent:
         state.human_review_required = False
         state.updated_at = datetime.now()
         
-        # Save final state
-        self.db.save_agent_state(state)
-        
-        # Remove from review queue if present
-        self.db.remove_from_review_queue(state.workflow_id)
-        
         # Add finalization event
         final_event = WorkflowEvent(
             workflow_id=state.workflow_id,
             event_type="WORKFLOW_FINALIZED",
             data={"final_status": "completed"},
-            timestamp=datetime.now().isoformat(),
+            timestamp=_now_iso(),
             step_name="finalization"
         )
-        self.db.add_workflow_event(final_event)
+        
+        # Save final state, record the event and dequeue in one transaction
+        await self._write_batch(state, [final_event], remove_from_queue=True)
 
 
 # API endpoints for human review actions
@@ -381,9 +421,14 @@ async def lifespan(app: FastAPI):
     """FastAPI lifespan manager"""
     # Startup
     print("AG-UI Document Workflow Server starting...")
+    app.state.db = WorkflowDatabase()
+    workflow_agent.db = app.state.db
+    workflow_agent.writer.start()
     yield
     # Shutdown
     print("AG-UI Document Workflow Server shutting down...")
+    await workflow_agent.writer.stop()
+    app.state.db.close()
 
 
 # Create FastAPI app
@@ -391,21 +436,60 @@ app = FastAPI(
     title="AI Workflow Engine - AG-UI Server",
     description="AG-UI compatible server for document workflow processing",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse if orjson is not None else JSONResponse
 )
 
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],  # Configure appropriately for production
+    # Explicit origins (comma-separated CORS_ORIGIN) let browsers cache preflights for a day
+    allow_origins=os.getenv("CORS_ORIGIN", "http://localhost:3000").split(","),
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["GET", "POST"],
+    allow_headers=["Content-Type", "Authorization"],
+    max_age=86400,
 )
 
+# Response media types that must not be buffered by compression (live event streams)
+_UNCOMPRESSED_MEDIA_TYPES = {"text/event-stream", "application/x-ndjson"}
+
+class _StreamAwareGZipResponder(GZipResponder):
+    """GZipResponder that passes streaming media types through untouched"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._passthrough = False
+    
+    async def send_with_gzip(self, message):
+        if message["type"] == "http.response.start":
+            media_type = Headers(raw=message["headers"]).get("content-type", "").split(";")[0].strip()
+            self._passthrough = media_type in _UNCOMPRESSED_MEDIA_TYPES
+        if self._passthrough:
+            await self.send(message)
+        else:
+            await super().send_with_gzip(message)
+
+class _GZipExceptStreams(GZipMiddleware):
+    """GZip HTTP responses, bypassing event-stream and NDJSON responses"""
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and "gzip" in Headers(scope=scope).get("Accept-Encoding", ""):
+            responder = _StreamAwareGZipResponder(self.app, self.minimum_size, compresslevel=self.compresslevel)
+            await responder(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
+
+# Compress the repetitive workflow JSON returned by /api/workflows/*
+app.add_middleware(_GZipExceptStreams, minimum_size=1024)
+
 # Create agent instance
 workflow_agent = DocumentWorkflowAgent()
 
+def get_db(request: Request) -> WorkflowDatabase:
+    """Return the WorkflowDatabase created once in lifespan"""
+    return request.app.state.db
+
 # AG-UI compatible endpoints
 @app.post("/agent/run")
 async def agent_run(request: RunRequest):
@@ -413,16 +497,21 @@ async def agent_run(request: RunRequest):
     
     async def generate():
         async for event in workflow_agent.run(request):
+            if event.type == "KEEPALIVE":
+                # SSE comment: keeps the connection open, ignored by clients
+                yield _SSE_KEEPALIVE
+                continue
             # Convert to AG-UI protocol format
-            event_data = event.model_dump()
-            yield f"data: {json.dumps(event_data)}\n\n"
+            yield _sse_frame(event.to_wire_dict())
     
     return StreamingResponse(
         generate(), 
-        media_type="text/plain",
+        media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
             "Connection": "keep-alive",
+            # Stop nginx-style proxies from buffering the stream
+            "X-Accel-Buffering": "no",
         }
     )
 
@@ -449,7 +538,10 @@ async def agent_websocket(websocket: WebSocket):
                 
                 # Stream response back
                 async for event in workflow_agent.run(request):
-                    await websocket.send_json(event.model_dump())
+                    if event.type == "KEEPALIVE":
+                        continue
+                    # Encode once with orjson and send as a text frame
+                    await websocket.send_text(_dumps(event.to_wire_dict()))
     
     except WebSocketDisconnect:
         print("AG-UI client disconnected")
@@ -457,32 +549,47 @@ async def agent_websocket(websocket: WebSocket):
         print(f"WebSocket error: {e}")
 
 # Additional API endpoints
+_NDJSON = "application/x-ndjson"
+
+def _wants_ndjson(request: Request) -> bool:
+    """Clients opt into record-by-record streaming with Accept: application/x-ndjson"""
+    return _NDJSON in request.headers.get("accept", "")
+
+def _ndjson_response(records) -> StreamingResponse:
+    """Stream records as newline-delimited JSON, encoding each one only when it is sent"""
+    async def generate():
+        for record in records:
+            yield _dumps(record) + "\n"
+    
+    return StreamingResponse(generate(), media_type=_NDJSON)
+
+def _pending_record(state: AgentState) -> Dict[str, Any]:
+    """Summary of a workflow waiting for review"""
+    return {
+        "workflow_id": state.workflow_id,
+        "status": state.status,
+        "extracted_data": _extracted_dict(state),
+        "validation_reasons": state.validation_result.reasons if state.validation_result else [],
+        "created_at": state.created_at.isoformat(),
+        "updated_at": state.updated_at.isoformat()
+    }
+
 @app.get("/api/workflows/pending")
-async def get_pending_reviews():
+async def get_pending_reviews(request: Request, db: WorkflowDatabase = Depends(get_db)):
     """Get workflows pending human review"""
-    db = WorkflowDatabase()
-    pending_ids = db.get_pending_reviews()
-    
-    pending_workflows = []
-    for workflow_id in pending_ids:
-        state = db.get_agent_state(workflow_id)
-        if state:
-            pending_workflows.append({
-                "workflow_id": state.workflow_id,
-                "status": state.status,
-                "extracted_data": state.extracted_data.model_dump() if state.extracted_data else {},
-                "validation_reasons": state.validation_result.reasons if state.validation_result else [],
-                "created_at": state.created_at.isoformat(),
-                "updated_at": state.updated_at.isoformat()
-            })
+    pending_ids = await asyncio.to_thread(db.get_pending_reviews)
+    states = await asyncio.to_thread(db.get_agent_states_bulk, pending_ids)
     
-    return {"pending_workflows": pending_workflows}
+    if _wants_ndjson(request):
+        # One workflow per line
+        return _ndjson_response(_pending_record(state) for state in states)
+    
+    return {"pending_workflows": [_pending_record(state) for state in states]}
 
 @app.post("/api/workflows/{workflow_id}/approve")
-async def approve_workflow(workflow_id: str, request: ReviewActionRequest):
+async def approve_workflow(workflow_id: str, request: ReviewActionRequest, db: WorkflowDatabase = Depends(get_db)):
     """Approve a workflow with optional data corrections"""
-    db = WorkflowDatabase()
-    state = db.get_agent_state(workflow_id)
+    state = await asyncio.to_thread(db.get_agent_state, workflow_id)
     
     if not state:
         raise HTTPException(status_code=404, detail="Workflow not found")
@@ -492,8 +599,8 @@ async def approve_workflow(workflow_id: str, request: ReviewActionRequest):
     
     # Update data if provided
     if request.updated_data and state.extracted_data:
-        # Merge updated data
-        current_data = state.extracted_data.model_dump()
+        # Merge updated data (reassigning extracted_data invalidates the cached dict)
+        current_data = dict(_extracted_dict(state))
         current_data.update(request.updated_data)
         state.extracted_data = DocumentExtractedData(**current_data)
     
@@ -503,10 +610,9 @@ async def approve_workflow(workflow_id: str, request: ReviewActionRequest):
     return {"status": "approved", "workflow_id": workflow_id}
 
 @app.post("/api/workflows/{workflow_id}/reject")
-async def reject_workflow(workflow_id: str):
+async def reject_workflow(workflow_id: str, db: WorkflowDatabase = Depends(get_db)):
     """Reject a workflow"""
-    db = WorkflowDatabase()
-    state = db.get_agent_state(workflow_id)
+    state = await asyncio.to_thread(db.get_agent_state, workflow_id)
     
     if not state:
         raise HTTPException(status_code=404, detail="Workflow not found")
@@ -518,33 +624,40 @@ async def reject_workflow(workflow_id: str):
     state.human_review_required = False
     state.updated_at = datetime.now()
     
-    db.save_agent_state(state)
-    db.remove_from_review_queue(workflow_id)
+    await workflow_agent.writer.submit(db.write_batch, state, remove_from_queue=True)
     
     return {"status": "rejected", "workflow_id": workflow_id}
 
 @app.get("/api/workflows/{workflow_id}")
-async def get_workflow_details(workflow_id: str):
+async def get_workflow_details(workflow_id: str, request: Request, db: WorkflowDatabase = Depends(get_db)):
     """Get detailed workflow information"""
-    db = WorkflowDatabase()
-    state = db.get_agent_state(workflow_id)
+    state = await asyncio.to_thread(db.get_agent_state, workflow_id)
     
     if not state:
         raise HTTPException(status_code=404, detail="Workflow not found")
     
-    return {
+    details = {
         "workflow_id": state.workflow_id,
         "status": state.status.value,
         "current_step": state.current_step,
         "document_content": state.document_content,
-        "extracted_data": state.extracted_data.model_dump() if state.extracted_data else {},
+        "extracted_data": _extracted_dict(state),
         "validation_result": state.validation_result.model_dump() if state.validation_result else {},
         "human_review_required": state.human_review_required,
         "error_message": state.error_message,
-        "workflow_history": [event.model_dump() for event in state.workflow_history],
         "created_at": state.created_at.isoformat(),
         "updated_at": state.updated_at.isoformat()
     }
+    
+    if _wants_ndjson(request):
+        # Workflow record first, then one line per history event
+        return _ndjson_response(itertools.chain(
+            [details],
+            (event.model_dump() for event in state.workflow_history)
+        ))
+    
+    details["workflow_history"] = [event.model_dump() for event in state.workflow_history]
+    return details
 
 @app.get("/health")
 async def health_check():
@@ -558,5 +671,6 @@ if __name__ == "__main__":
         host="0.0.0.0",
         port=port,
         reload=True,
+        loop="uvloop" if uvloop is not None else "asyncio",
         log_level="info"
     )
\ No newline at end of file
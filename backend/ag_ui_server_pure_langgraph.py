@@ -6,10 +6,16 @@ This replaces the manual wrapper approach with true graph execution
 
 import os
 import json
+import queue
+import logging
+import logging.handlers
+import time
 import uuid
 import asyncio
+from array import array
+from collections import OrderedDict
 from datetime import datetime
-from typing import AsyncGenerator, Dict, Any, List, Optional
+from typing import AsyncGenerator, AsyncIterator, Dict, Any, List, Optional, Tuple
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
@@ -18,18 +24,141 @@ from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 import uvicorn
 
-# Fix import paths
-import sys
-import os
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+try:
+    import orjson
+except ImportError:
+    # Optional speedup; fall back to the stdlib json module
+    orjson = None
+
+try:
+    import uvloop
+except ImportError:
+    # Optional: libuv-backed event loop, not available on Windows
+    uvloop = None
 
 # Import pure LangGraph processor
-from ag_ui_langgraph_processor import AGUILangGraphWorkflow
+from backend.ag_ui_langgraph_processor import AGUILangGraphWorkflow
 from shared.types import (
     RunRequest, Message, AgentResponse, AgentState, 
     WorkflowStatus, DocumentExtractedData
 )
-from shared.database import WorkflowDatabase
+from shared.database import WorkflowDatabase, WriterActor
+from shared.serialization import (
+    SSE_PREFIX as _SSE_PREFIX, SSE_SUFFIX as _SSE_SUFFIX,
+    dumps as _dumps, now_iso as _now_iso, sse_frame as _sse_frame
+)
+
+logger = logging.getLogger(__name__)
+
+# Event persistence: queue bound, max events per transaction, and how long to wait to fill a batch
+_EVENT_QUEUE_SIZE = 256
+_EVENT_BATCH_SIZE = 64
+_EVENT_BATCH_WAIT = 0.05
+
+# Seconds a composed workflow status is served from memory before re-reading storage
+_STATE_CACHE_TTL = 0.5
+
+# Most workflows whose composed status is kept in memory; least recently cached are evicted first
+_STATE_CACHE_SIZE = 256
+
+# Streamed events between forced yields to the event loop, so one bursty workflow can't starve others
+_FAIR_YIELD_EVERY = 16
+
+# Clients offering this WebSocket subprotocol receive coalesced BATCH frames
+_WS_BATCH_SUBPROTOCOL = "ag-ui.batch"
+
+# WebSocket events produced within this window (up to the batch size) share one BATCH frame
+_WS_BATCH_WINDOW = 0.005
+_WS_BATCH_SIZE = 32
+
+# Event payload encoding for SSE and WebSocket frames (orjson when available)
+if orjson is not None:
+    def _encode_agent_response(event: AgentResponse) -> bytes:
+        """Encode AgentResponse's four fixed fields directly, without building an intermediate dict"""
+        return b"".join((
+            b'{"type":', orjson.dumps(event.type),
+            b',"data":', orjson.dumps(event.data, default=str),
+            b',"timestamp":', orjson.dumps(event.timestamp),
+            b',"workflow_id":', orjson.dumps(event.workflow_id),
+            b"}",
+        ))
+else:
+    def _encode_agent_response(event: AgentResponse) -> bytes:
+        return json.dumps(event.to_wire_dict(), default=str).encode()
+
+
+class ActiveWorkflowTable:
+    """Workflow tracking info stored column-wise: one compact array per field, indexed by slot"""
+    
+    STATUSES = ("running", "completed", "failed", "resumed")
+    _CODES = {name: code for code, name in enumerate(STATUSES)}
+    _UNSET = float("nan")
+    
+    def __init__(self):
+        self._index: Dict[str, int] = {}
+        self.ids: List[str] = []
+        self.status = array("B")
+        self.start_ts = array("d")
+        self.end_ts = array("d")
+        self.resume_ts = array("d")
+        self.errors: Dict[str, str] = {}  # Sparse: only failed workflows
+    
+    def __len__(self) -> int:
+        return len(self.ids)
+    
+    def start(self, workflow_id: str) -> None:
+        """Register a workflow as running"""
+        self._index[workflow_id] = len(self.ids)
+        self.ids.append(workflow_id)
+        self.status.append(self._CODES["running"])
+        self.start_ts.append(time.time())
+        self.end_ts.append(self._UNSET)
+        self.resume_ts.append(self._UNSET)
+    
+    def finish(self, workflow_id: str, error: Optional[str] = None) -> None:
+        """Mark a workflow completed, or failed when an error is given"""
+        i = self._index.get(workflow_id)
+        if i is None:
+            return
+        if error is None:
+            self.status[i] = self._CODES["completed"]
+            self.end_ts[i] = time.time()
+        else:
+            self.status[i] = self._CODES["failed"]
+            self.errors[workflow_id] = error
+    
+    def resume(self, workflow_id: str) -> None:
+        """Mark a paused workflow as resumed"""
+        i = self._index.get(workflow_id)
+        if i is not None:
+            self.status[i] = self._CODES["resumed"]
+            self.resume_ts[i] = time.time()
+    
+    def count(self, status: str) -> int:
+        """Number of workflows in the given status (a single C-level scan)"""
+        return self.status.count(self._CODES[status])
+    
+    def get(self, workflow_id: str) -> Dict[str, Any]:
+        """Tracking info for one workflow in the original dict shape ({} if unknown)"""
+        i = self._index.get(workflow_id)
+        if i is None:
+            return {}
+        info: Dict[str, Any] = {
+            "start_time": datetime.fromtimestamp(self.start_ts[i]),
+            "status": self.STATUSES[self.status[i]],
+        }
+        # NaN marks an unset timestamp
+        if self.end_ts[i] == self.end_ts[i]:
+            info["end_time"] = datetime.fromtimestamp(self.end_ts[i])
+        if self.resume_ts[i] == self.resume_ts[i]:
+            info["resume_time"] = datetime.fromtimestamp(self.resume_ts[i])
+        if workflow_id in self.errors:
+            info["error"] = self.errors[workflow_id]
+        return info
+    
+    def as_dict(self) -> Dict[str, Dict[str, Any]]:
+        """All tracking info keyed by workflow_id"""
+        return {workflow_id: self.get(workflow_id) for workflow_id in self.ids}
 
 
 class PureLangGraphWorkflowAgent:
@@ -38,34 +167,92 @@ class PureLangGraphWorkflowAgent:
     def __init__(self):
         self.langgraph_workflow = AGUILangGraphWorkflow()
         self.db = WorkflowDatabase()
-        self.active_workflows = {}  # Track running workflows
+        self.writer = WriterActor()  # Sole owner of database writes
+        self.active_workflows = ActiveWorkflowTable()  # Track running workflows
+        # workflow_id -> (monotonic time, langgraph state, database state), refreshed on writes
+        self._state_cache: "OrderedDict[str, Tuple[float, Optional[Dict[str, Any]], Optional[AgentState]]]" = OrderedDict()
+        # workflow_id -> fingerprint of the last saved state (ignoring updated_at), for the running stream
+        self._last_state_hash: Dict[str, int] = {}
+        self._event_queue: Optional[asyncio.Queue] = None
+        self._writer_task: Optional[asyncio.Task] = None
+    
+    def start_event_writer(self):
+        """Start the background task that persists workflow events in batches"""
+        self._event_queue = asyncio.Queue(maxsize=_EVENT_QUEUE_SIZE)
+        self._writer_task = asyncio.create_task(self._db_writer())
+    
+    async def stop_event_writer(self):
+        """Flush queued events, then stop the writer task"""
+        if self._writer_task is None:
+            return
+        await self._event_queue.join()
+        self._writer_task.cancel()
+        try:
+            await self._writer_task
+        except asyncio.CancelledError:
+            pass
+        self._writer_task = None
+        self._event_queue = None
+    
+    async def _db_writer(self):
+        """Drain up to _EVENT_BATCH_SIZE events (or whatever arrives within _EVENT_BATCH_WAIT) per transaction"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._event_queue.get()]
+            deadline = loop.time() + _EVENT_BATCH_WAIT
+            while len(batch) < _EVENT_BATCH_SIZE:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._event_queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            try:
+                await self.writer.submit(self.db.add_workflow_event_rows, batch)
+            except Exception as e:
+                logger.warning("Could not persist %d workflow events: %s", len(batch), e)
+            finally:
+                for _ in batch:
+                    self._event_queue.task_done()
+    
+    async def _record_event(
+        self, workflow_id: str, event_type: str, data: Dict[str, Any], step_name: str, timestamp: str
+    ):
+        """Queue an event row for the batch writer (written directly if the writer isn't running)"""
+        # Plain tuples: no WorkflowEvent model is built per streamed event
+        row = (workflow_id, event_type, data, step_name, timestamp)
+        if self._event_queue is None:
+            await self.writer.submit(self.db.add_workflow_event_rows, [row])
+        else:
+            await self._event_queue.put(row)
     
     async def run(self, request: RunRequest) -> AsyncGenerator[AgentResponse, None]:
         """Run pure LangGraph workflow with AG-UI streaming"""
         
         # Extract document content
-        document_content = ""
-        for message in request.messages:
-            if message.role == "user":
-                document_content += message.content + "\n"
+        document_content = "\n".join(m.content for m in request.messages if m.role == "user").strip()
         
-        if not document_content.strip():
+        if not document_content:
             yield AgentResponse(
                 type="RUN_ERROR",
                 data={"error": "No document content provided"},
-                timestamp=datetime.now().isoformat()
+                timestamp=_now_iso()
             )
             return
         
         workflow_id = str(uuid.uuid4())
+        initial_agent_state: Optional[AgentState] = None
+        initial_pending = True  # Initial state is saved with the first event, in one transaction
         
         try:
-            # Save initial state for database tracking
+            # Initial state for database tracking
             initial_agent_state = AgentState(
                 workflow_id=workflow_id,
                 status=WorkflowStatus.RECEIVED,
                 current_step="initializing",
-                document_content=document_content.strip(),
+                document_content=document_content,
                 extracted_data=None,
                 human_review_required=False,
                 reason_for_review=None,
@@ -74,38 +261,33 @@ class PureLangGraphWorkflowAgent:
                 updated_at=datetime.now()
             )
             
-            self.db.save_agent_state(initial_agent_state)
-            print(f"[AG-UI] Starting pure LangGraph workflow: {workflow_id}")
+            logger.info("Starting pure LangGraph workflow: %s", workflow_id)
             
             # Track active workflow
-            self.active_workflows[workflow_id] = {
-                "start_time": datetime.now(),
-                "status": "running"
-            }
+            self.active_workflows.start(workflow_id)
             
             # Stream LangGraph workflow execution
             event_count = 0
-            async for event in self.langgraph_workflow.run_streaming_workflow(
-                document_content.strip(), 
-                workflow_id
-            ):
+            # The graph already runs in its own task behind a bounded queue, so it overlaps DB/JSON work here
+            async for event in self.langgraph_workflow.run_streaming_workflow(document_content, workflow_id):
                 event_count += 1
+                if event_count % _FAIR_YIELD_EVERY == 0:
+                    await asyncio.sleep(0)
                 
-                # Save all events to database  
-                from shared.types import WorkflowEvent
-                workflow_event = WorkflowEvent(
-                    workflow_id=workflow_id,
-                    event_type=event.type,
-                    data=event.data,
-                    timestamp=event.timestamp,
-                    step_name=event.data.get("current_step", "unknown")
-                )
-                self.db.add_workflow_event(workflow_event)
+                row = (workflow_id, event.type, event.data, event.data.get("current_step", "unknown"), event.timestamp)
+                if initial_pending:
+                    await self.writer.submit(self.db.write_batch, initial_agent_state, event_rows=[row])
+                    initial_pending = False
+                else:
+                    # Queue every later event for the batched database writer
+                    await self._record_event(*row)
                 
                 # Update database state on key events
                 if event.type in ["STATE_UPDATE", "HUMAN_INPUT_REQUIRED", "RUN_FINISHED"]:
                     try:
-                        langgraph_state = self.langgraph_workflow.get_workflow_state(workflow_id)
+                        langgraph_state = await asyncio.to_thread(
+                            self.langgraph_workflow.get_workflow_state, workflow_id
+                        )
                         if langgraph_state:
                             updated_state = AgentState(
                                 workflow_id=workflow_id,
@@ -119,96 +301,113 @@ class PureLangGraphWorkflowAgent:
                                 created_at=langgraph_state.get("created_at", initial_agent_state.created_at),
                                 updated_at=datetime.now()
                             )
-                            self.db.save_agent_state(updated_state)
-                            
-                            # Add to review queue if needed
+                            # Skip the write when nothing but updated_at has changed
+                            state_hash = hash(_dumps(updated_state.model_dump(exclude={"updated_at"})))
                             if event.type == "HUMAN_INPUT_REQUIRED":
-                                self.db.add_to_review_queue(
-                                    workflow_id,
-                                    langgraph_state.get("reason_for_review", "Review required")
+                                # State and review-queue entry in one transaction
+                                await self.writer.submit(
+                                    self.db.write_batch,
+                                    updated_state,
+                                    review_reason=langgraph_state.get("reason_for_review", "Review required")
                                 )
+                            elif self._last_state_hash.get(workflow_id) != state_hash:
+                                await self.writer.submit(self.db.save_agent_state, updated_state)
+                            self._last_state_hash[workflow_id] = state_hash
+                            self._cache_state(workflow_id, langgraph_state, updated_state)
                     except Exception as state_error:
-                        print(f"[AG-UI] Warning: Could not update database state: {state_error}")
+                        logger.warning("Could not update database state: %s", state_error)
                 
                 yield event
             
             # Mark workflow as completed
-            self.active_workflows[workflow_id]["status"] = "completed"
-            self.active_workflows[workflow_id]["end_time"] = datetime.now()
+            self.active_workflows.finish(workflow_id)
             
-            print(f"[AG-UI] Workflow {workflow_id} completed with {event_count} events")
+            logger.info("Workflow %s completed with %d events", workflow_id, event_count)
             
         except Exception as e:
-            print(f"[AG-UI] Error in workflow {workflow_id}: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Error in workflow %s: %s", workflow_id, e)
             
             # Mark workflow as failed
-            if workflow_id in self.active_workflows:
-                self.active_workflows[workflow_id]["status"] = "failed"
-                self.active_workflows[workflow_id]["error"] = str(e)
+            self.active_workflows.finish(workflow_id, error=str(e))
             
             error_event = AgentResponse(
                 type="RUN_ERROR",
                 data={"error": str(e), "workflow_id": workflow_id},
-                timestamp=datetime.now().isoformat(),
+                timestamp=_now_iso(),
                 workflow_id=workflow_id
             )
             
-            # Save error event
-            from shared.types import WorkflowEvent
-            error_workflow_event = WorkflowEvent(
-                workflow_id=workflow_id,
-                event_type="RUN_ERROR",
-                data={"error": str(e)},
-                timestamp=datetime.now().isoformat(),
-                step_name="error"
-            )
-            self.db.add_workflow_event(error_workflow_event)
+            # Save error event (with the initial state if no event made it to the database)
+            row = (workflow_id, "RUN_ERROR", {"error": str(e)}, "error", error_event.timestamp)
+            if initial_pending and initial_agent_state is not None:
+                await self.writer.submit(self.db.write_batch, initial_agent_state, event_rows=[row])
+            else:
+                await self._record_event(*row)
             
             yield error_event
+        
+        finally:
+            self._last_state_hash.pop(workflow_id, None)
+            self._state_cache.pop(workflow_id, None)
     
     async def resume_workflow(self, workflow_id: str, updated_data: Dict[str, Any] = None) -> bool:
         """Resume paused workflow"""
         try:
-            print(f"[AG-UI] Resuming workflow: {workflow_id}")
+            logger.info("Resuming workflow: %s", workflow_id)
             
             success = await self.langgraph_workflow.resume_workflow(workflow_id, updated_data)
+            self._state_cache.pop(workflow_id, None)
             
             if success:
                 # Update workflow tracking
-                if workflow_id in self.active_workflows:
-                    self.active_workflows[workflow_id]["status"] = "resumed"
-                    self.active_workflows[workflow_id]["resume_time"] = datetime.now()
+                self.active_workflows.resume(workflow_id)
                 
                 # Remove from review queue
-                self.db.remove_from_review_queue(workflow_id)
+                await self.writer.submit(self.db.remove_from_review_queue, workflow_id)
                 
-                print(f"[AG-UI] Successfully resumed workflow: {workflow_id}")
+                logger.info("Successfully resumed workflow: %s", workflow_id)
             else:
-                print(f"[AG-UI] Failed to resume workflow: {workflow_id}")
+                logger.warning("Failed to resume workflow: %s", workflow_id)
                 
             return success
             
         except Exception as e:
-            print(f"[AG-UI] Error resuming workflow {workflow_id}: {e}")
+            logger.error("Error resuming workflow %s: %s", workflow_id, e)
             return False
     
-    def get_workflow_status(self, workflow_id: str) -> Optional[Dict[str, Any]]:
-        """Get workflow status"""
-        langgraph_state = self.langgraph_workflow.get_workflow_state(workflow_id)
-        tracking_info = self.active_workflows.get(workflow_id, {})
+    def _cache_state(self, workflow_id: str, langgraph_state: Optional[Dict[str, Any]],
+                     database_state: Optional[AgentState]) -> None:
+        """Store a composed status, evicting the least recently cached entries past _STATE_CACHE_SIZE"""
+        self._state_cache[workflow_id] = (time.monotonic(), langgraph_state, database_state)
+        self._state_cache.move_to_end(workflow_id)
+        while len(self._state_cache) > _STATE_CACHE_SIZE:
+            self._state_cache.popitem(last=False)
+    
+    async def get_workflow_status(self, workflow_id: str) -> Optional[Dict[str, Any]]:
+        """Get workflow status, from the state cache when fresh, else from checkpoint and database reads"""
+        cached = self._state_cache.get(workflow_id)
+        if cached is not None and time.monotonic() - cached[0] < _STATE_CACHE_TTL:
+            _, langgraph_state, database_state = cached
+        else:
+            langgraph_state, database_state = await asyncio.gather(
+                asyncio.to_thread(self.langgraph_workflow.get_workflow_state, workflow_id),
+                asyncio.to_thread(self.db.get_agent_state, workflow_id)
+            )
+            # Unknown ids are not cached, so polling arbitrary ids can't grow the cache
+            if langgraph_state is not None or database_state is not None:
+                self._cache_state(workflow_id, langgraph_state, database_state)
+        tracking_info = self.active_workflows.get(workflow_id)
         
         return {
             "workflow_id": workflow_id,
             "langgraph_state": langgraph_state,
             "tracking_info": tracking_info,
-            "database_state": self.db.get_agent_state(workflow_id)
+            "database_state": database_state
         }
     
     def get_active_workflows(self) -> Dict[str, Any]:
         """Get all active workflows"""
-        return self.active_workflows
+        return self.active_workflows.as_dict()
 
 
 # Global workflow instance
@@ -219,10 +418,29 @@ async def lifespan(app: FastAPI):
     """Application lifespan management"""
     global workflow_engine
     
-    print("[AG-UI] Initializing Pure LangGraph Workflow Engine...")
+    # Log records are formatted and written by a listener thread, never on the event loop
+    log_queue: queue.Queue = queue.Queue(-1)
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter("[AG-UI] %(message)s"))
+    listener = logging.handlers.QueueListener(log_queue, stream_handler)
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    logger.addHandler(queue_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    listener.start()
+    
+    logger.info("Initializing Pure LangGraph Workflow Engine...")
     workflow_engine = PureLangGraphWorkflowAgent()
+    workflow_engine.writer.start()
+    workflow_engine.start_event_writer()
     yield
-    print("[AG-UI] Shutting down Pure LangGraph Workflow Engine...")
+    logger.info("Shutting down Pure LangGraph Workflow Engine...")
+    await workflow_engine.stop_event_writer()
+    await workflow_engine.writer.stop()
+    workflow_engine.langgraph_workflow.close()
+    workflow_engine.db.close()
+    logger.removeHandler(queue_handler)
+    listener.stop()
 
 # Create FastAPI app with lifespan
 app = FastAPI(
@@ -235,10 +453,12 @@ app = FastAPI(
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["http://localhost:3000", "http://127.0.0.1:3000"],
+    # Explicit origins (comma-separated CORS_ORIGIN) let browsers cache preflights for a day
+    allow_origins=os.getenv("CORS_ORIGIN", "http://localhost:3000,http://127.0.0.1:3000").split(","),
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["GET", "POST"],
+    allow_headers=["Content-Type", "Authorization"],
+    max_age=86400,
 )
 
 
@@ -253,32 +473,87 @@ async def agent_run(request: RunRequest):
     async def generate():
         try:
             async for event in workflow_engine.run(request):
-                event_data = event.model_dump()
-                yield f"data: {json.dumps(event_data)}\n\n"
+                yield _SSE_PREFIX + _encode_agent_response(event) + _SSE_SUFFIX
                 
         except Exception as e:
             error_event = {
                 "type": "RUN_ERROR",
                 "data": {"error": str(e)},
-                "timestamp": datetime.now().isoformat()
+                "timestamp": _now_iso()
             }
-            yield f"data: {json.dumps(error_event)}\n\n"
+            yield _sse_frame(error_event)
     
     return StreamingResponse(
         generate(),
-        media_type="text/plain",
+        media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
             "Connection": "keep-alive",
-            "Access-Control-Allow-Origin": "*",
+            # Stop nginx-style proxies from buffering the stream
+            "X-Accel-Buffering": "no",
         }
     )
 
+async def _send_events(websocket: WebSocket, events: AsyncIterator[AgentResponse]) -> None:
+    """Send one event per frame, the wire format every /agent/ws client understands"""
+    async for event in events:
+        await websocket.send_text(_encode_agent_response(event).decode())
+
+async def _send_coalesced(websocket: WebSocket, events: AsyncIterator[AgentResponse]) -> None:
+    """Send events over the WebSocket, merging bursts into {"type": "BATCH", "events": [...]} frames"""
+    pending: asyncio.Queue = asyncio.Queue(maxsize=_WS_BATCH_SIZE)
+    done = object()
+    
+    async def produce():
+        try:
+            async for event in events:
+                await pending.put(_encode_agent_response(event))
+        except Exception:
+            await pending.put(done)
+            raise
+        await pending.put(done)
+    
+    producer = asyncio.create_task(produce())
+    try:
+        item = None
+        while item is not done:
+            item = await pending.get()
+            if item is done:
+                break
+            batch = [item]
+            while len(batch) < _WS_BATCH_SIZE:
+                try:
+                    item = await asyncio.wait_for(pending.get(), _WS_BATCH_WINDOW)
+                except asyncio.TimeoutError:
+                    break
+                if item is done:
+                    break
+                batch.append(item)
+            # A lone event goes out as-is
+            if len(batch) == 1:
+                payload = batch[0]
+            else:
+                payload = b'{"type":"BATCH","events":[' + b",".join(batch) + b"]}"
+            await websocket.send_text(payload.decode())
+    finally:
+        producer.cancel()
+        try:
+            await producer
+        except asyncio.CancelledError:
+            pass
+
 # WebSocket endpoint (alternative streaming method)
 @app.websocket("/agent/ws")
 async def agent_websocket(websocket: WebSocket):
-    """WebSocket streaming endpoint for bidirectional communication"""
-    await websocket.accept()
+    """WebSocket streaming endpoint for bidirectional communication.
+
+    Events are sent one per frame. Clients that request the "ag-ui.batch"
+    subprotocol instead get bursts as {"type": "BATCH", "events": [...]} frames
+    (a lone event is still sent unwrapped) and must unpack them.
+    """
+    batch_frames = _WS_BATCH_SUBPROTOCOL in websocket.scope.get("subprotocols", [])
+    await websocket.accept(subprotocol=_WS_BATCH_SUBPROTOCOL if batch_frames else None)
+    send_events = _send_coalesced if batch_frames else _send_events
     
     try:
         while True:
@@ -291,8 +566,7 @@ async def agent_websocket(websocket: WebSocket):
                     state=data.get("state", {})
                 )
                 
-                async for event in workflow_engine.run(request):
-                    await websocket.send_json(event.model_dump())
+                await send_events(websocket, workflow_engine.run(request))
                     
             elif data.get("type") == "resume":
                 workflow_id = data.get("workflow_id")
@@ -307,7 +581,7 @@ async def agent_websocket(websocket: WebSocket):
                 
             elif data.get("type") == "status":
                 workflow_id = data.get("workflow_id")
-                status = workflow_engine.get_workflow_status(workflow_id)
+                status = await workflow_engine.get_workflow_status(workflow_id)
                 await websocket.send_json({
                     "type": "STATUS_RESPONSE",
                     "workflow_id": workflow_id,
@@ -315,9 +589,9 @@ async def agent_websocket(websocket: WebSocket):
                 })
     
     except WebSocketDisconnect:
-        print("[AG-UI] WebSocket client disconnected")
+        logger.info("WebSocket client disconnected")
     except Exception as e:
-        print(f"[AG-UI] WebSocket error: {e}")
+        logger.error("WebSocket error: %s", e)
         await websocket.close(code=1000)
 
 # REST API Endpoints
@@ -325,7 +599,7 @@ async def agent_websocket(websocket: WebSocket):
 async def list_workflows():
     """List all workflows"""
     try:
-        workflows = workflow_engine.db.get_all_workflows()
+        workflows = await asyncio.to_thread(workflow_engine.db.get_all_workflows)
         return {"workflows": workflows}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -334,7 +608,7 @@ async def list_workflows():
 async def get_workflow(workflow_id: str):
     """Get specific workflow details"""
     try:
-        status = workflow_engine.get_workflow_status(workflow_id)
+        status = await workflow_engine.get_workflow_status(workflow_id)
         if not status:
             raise HTTPException(status_code=404, detail="Workflow not found")
         return status
@@ -361,19 +635,60 @@ async def approve_workflow(workflow_id: str, updated_data: Dict[str, Any] = None
 async def get_pending_workflows():
     """Get workflows pending human review"""
     try:
-        pending = workflow_engine.db.get_pending_reviews()
+        pending = await asyncio.to_thread(workflow_engine.db.get_pending_reviews)
         return {"pending_workflows": pending}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+async def _stream_workflow_events(db: WorkflowDatabase, workflow_id: str) -> AsyncIterator[bytes]:
+    """Encode {"workflow_id": ..., "events": [...]} a page of rows at a time"""
+    yield f'{{"workflow_id":{_dumps(workflow_id)},"events":['.encode()
+    separator = ""
+    after = None
+    while True:
+        # Each page borrows and returns its own read connection, so a client
+        # disconnect between pages never strands a pooled connection
+        rows, after = await asyncio.to_thread(db.fetch_workflow_event_rows, workflow_id, after)
+        if rows:
+            # Stored data is already JSON text, so it is spliced in without a decode/encode round trip
+            chunk = ",".join(
+                f'{{"event_type":{_dumps(event_type)},"data":{data},"timestamp":{_dumps(timestamp)},'
+                f'"workflow_id":{_dumps(wid)},"step_name":{_dumps(step_name)}}}'
+                for wid, event_type, data, step_name, timestamp in rows
+            )
+            yield (separator + chunk).encode()
+            separator = ","
+        if after is None:
+            break
+    yield b"]}"
+
 @app.get("/api/workflows/{workflow_id}/events")
 async def get_workflow_events(workflow_id: str):
-    """Get all events for a workflow"""
+    """Get all events for a workflow, streamed from the database instead of built in memory"""
+    db = workflow_engine.db
     try:
-        events = workflow_engine.db.get_workflow_events(workflow_id)
-        return {"workflow_id": workflow_id, "events": events}
+        if not await asyncio.to_thread(db.workflow_exists, workflow_id):
+            raise HTTPException(status_code=404, detail="Workflow not found")
+        # Read the first page up front so database errors still map to a 500
+        stream = _stream_workflow_events(db, workflow_id)
+        head = await stream.__anext__()
+        first = await stream.__anext__()
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    
+    async def body() -> AsyncIterator[bytes]:
+        yield head + first
+        try:
+            async for chunk in stream:
+                yield chunk
+        except Exception as e:
+            # Headers are already sent; log and cut the body short so the client sees invalid JSON
+            logger.error("Event stream for %s failed: %s", workflow_id, e)
+            raise
+    
+    return StreamingResponse(body(), media_type="application/json")
 
 @app.get("/api/system/status")
 async def system_status():
@@ -384,6 +699,9 @@ async def system_status():
         return {
             "status": "healthy",
             "active_workflows": len(active_workflows),
+            "running_workflows": workflow_engine.active_workflows.count("running"),
+            # Tracking is per worker process when running with WEB_CONCURRENCY > 1
+            "worker_pid": os.getpid(),
             "workflow_details": active_workflows,
             "server_type": "Pure LangGraph + AG-UI",
             "version": "2.0.0"
@@ -401,7 +719,7 @@ async def health_check():
     """Health check endpoint"""
     return {
         "status": "healthy",
-        "timestamp": datetime.now().isoformat(),
+        "timestamp": _now_iso(),
         "server": "Pure LangGraph AG-UI Server",
         "version": "2.0.0"
     }
@@ -415,10 +733,14 @@ if __name__ == "__main__":
     print("- HTTP SSE and WebSocket support")
     print("- State persistence with SQLite")
     
+    # Several worker processes share the WAL-mode SQLite files; reload only works with one
+    workers = int(os.getenv("WEB_CONCURRENCY", "1"))
     uvicorn.run(
         "ag_ui_server_pure_langgraph:app",
         host="0.0.0.0",
         port=8000,
-        reload=True,
+        workers=workers,
+        reload=workers == 1,
+        loop="uvloop" if uvloop is not None else "asyncio",
         log_level="info"
     )
\ No newline at end of file
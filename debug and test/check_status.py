@@ -3,9 +3,86 @@
 Quick script to check workflow status in database
 """
 
-import sqlite3
+import os
+import sys
 import json
+import atexit
+import sqlite3
+from itertools import islice
 from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+from shared.types import WorkflowStatus
+
+try:
+    import orjson
+except ImportError:
+    # Optional speedup; fall back to the stdlib json module
+    orjson = None
+
+_loads = orjson.loads if orjson is not None else json.loads
+
+# Output line templates, formatted into one buffer and written once
+_DOCUMENT_LINE = "  Document {}: {}\n".format
+_REASON_LINE = "    Reason: {}\n".format
+_WORKFLOW_LINE = "  {}\n".format
+
+# Read tuning for the status connection: mapped file, ~20 MB page cache, no writes
+_READ_PRAGMAS = """
+    PRAGMA busy_timeout=5000;
+    PRAGMA mmap_size=268435456;
+    PRAGMA cache_size=-20000;
+    PRAGMA query_only=1;
+"""
+
+# One read-only connection per path, reused across status checks. Opened directly
+# rather than through WorkflowDatabase, which would run its DDL against the file
+_CONN_CACHE: Dict[str, sqlite3.Connection] = {}
+
+def _get_conn(db_path: str) -> sqlite3.Connection:
+    """Return the cached read-only connection for db_path, opening it on first use"""
+    conn = _CONN_CACHE.get(db_path)
+    if conn is None:
+        uri = f"file:{os.path.abspath(db_path)}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True)
+        conn.executescript(_READ_PRAGMAS)
+        _CONN_CACHE[db_path] = conn
+    return conn
+
+@atexit.register
+def _close_conns():
+    for conn in _CONN_CACHE.values():
+        conn.close()
+
+def iter_document_statuses(
+    rows: Iterable[Tuple[str, Any]]
+) -> Iterator[Tuple[str, Any, Any, Any, Optional[str]]]:
+    """Lazily yield (thread_id, doc_id, status, reason, problem) per checkpoint row, parsing on demand"""
+    for thread_id, checkpoint_data in rows:
+        if not checkpoint_data:
+            yield (thread_id, None, None, None, "No checkpoint data")
+            continue
+        # Only blobs that mention a status can hold a workflow state worth parsing
+        probe = b'"status"' if isinstance(checkpoint_data, bytes) else '"status"'
+        if probe not in checkpoint_data:
+            yield (thread_id, None, None, None, "No workflow status in checkpoint")
+            continue
+        try:
+            state = _loads(checkpoint_data).get('channel_values', {})
+        except Exception as e:
+            yield (thread_id, None, None, None, f"Error parsing checkpoint - {e}")
+            continue
+        # First channel holding a workflow state
+        for value in state.values():
+            if isinstance(value, dict) and 'status' in value:
+                yield (
+                    thread_id,
+                    value.get('id', thread_id),
+                    value.get('status'),
+                    value.get('reason_for_review', ''),
+                    None
+                )
+                break
 
 def check_database_status():
     """Check what's in the database"""
@@ -16,45 +93,59 @@ def check_database_status():
         return
     
     try:
-        conn = sqlite3.connect(db_path)
+        conn = _get_conn(db_path)
         cursor = conn.cursor()
+        try:
+            # Table names and checkpoint columns in one round-trip, tagged by source
+            cursor.execute("""
+                SELECT 'table', name FROM sqlite_master WHERE type = 'table'
+                UNION ALL
+                SELECT 'column', name FROM pragma_table_info('checkpoints')
+            """)
+            schema = {"table": [], "column": []}
+            for src, name in cursor.fetchall():
+                schema[src].append(name)
+            print(f"Tables in database: {schema['table']}")
+            print(f"Checkpoint columns: {schema['column']}")
+            has_ag_ui = "ag_ui_workflows" in schema["table"]
         
-        # Get table info
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-        tables = cursor.fetchall()
-        print(f"Tables in database: {[t[0] for t in tables]}")
-        
-        # Check checkpoints
-        cursor.execute("PRAGMA table_info(checkpoints)")
-        columns = cursor.fetchall()
-        print(f"Checkpoint columns: {[col[1] for col in columns]}")
-        
-        cursor.execute("SELECT thread_id, checkpoint FROM checkpoints LIMIT 5")
-        rows = cursor.fetchall()
-        
-        print(f"\nFound {len(rows)} recent checkpoints:")
-        for thread_id, checkpoint_data in rows:
-            if checkpoint_data:
-                try:
-                    checkpoint = json.loads(checkpoint_data)
-                    if 'channel_values' in checkpoint:
-                        state = checkpoint['channel_values']
-                        # Find workflow state
-                        for key, value in state.items():
-                            if isinstance(value, dict) and 'status' in value:
-                                status = value.get('status')
-                                doc_id = value.get('id', thread_id)
-                                reason = value.get('reason_for_review', '')
-                                print(f"  Document {doc_id}: {status}")
-                                if reason:
-                                    print(f"    Reason: {reason}")
-                                break
-                except Exception as e:
-                    print(f"  {thread_id}: Error parsing checkpoint - {e}")
+            # Newest first; rows are fetched and parsed only until five have been reported.
+            # Workflows the AG-UI table already records as finalized/errored are skipped
+            if has_ag_ui:
+                cursor.execute("""
+                    SELECT thread_id, checkpoint FROM checkpoints
+                    WHERE thread_id NOT IN (
+                        SELECT workflow_id FROM ag_ui_workflows WHERE status IN (?, ?)
+                    )
+                    ORDER BY rowid DESC
+                """, (WorkflowStatus.FINALIZED.value, WorkflowStatus.ERROR.value))
             else:
-                print(f"  {thread_id}: No checkpoint data")
+                cursor.execute("SELECT thread_id, checkpoint FROM checkpoints ORDER BY rowid DESC")
         
-        conn.close()
+            statuses = list(islice(iter_document_statuses(cursor), 5))
+            out = ["\nRecent checkpoints:\n"]
+            for thread_id, doc_id, status, reason, problem in statuses:
+                if problem:
+                    out.append(f"  {thread_id}: {problem}\n")
+                    continue
+                out.append(_DOCUMENT_LINE(doc_id, status))
+                if reason:
+                    out.append(_REASON_LINE(reason))
+            out.append(f"Found {len(statuses)} recent checkpoints\n")
+            
+            # AG-UI review queue (served by idx_ag_ui_workflows_pending)
+            if has_ag_ui:
+                cursor.execute("""
+                    SELECT workflow_id FROM ag_ui_workflows
+                    WHERE human_review_required = TRUE
+                    AND status = ?
+                """, (WorkflowStatus.PENDING_REVIEW.value,))
+                pending = [row[0] for row in cursor.fetchall()]
+                out.append(f"\nWorkflows pending review: {len(pending)}\n")
+                out.extend(map(_WORKFLOW_LINE, pending))
+        finally:
+            cursor.close()
+        sys.stdout.write("".join(out))
         
     except Exception as e:
         print(f"Database error: {e}")
@@ -4,6 +4,7 @@ Debug script to test validation workflow
 """
 
 from engine import run_workflow, create_workflow, setup_database
+from extract_cache import enable_extract_cache
 
 def test_large_invoice():
     large_invoice = """
@@ -41,4 +42,5 @@ Services: Consulting
             print(f"Error getting final state: {e}")
 
 if __name__ == "__main__":
+    enable_extract_cache()
     test_large_invoice()
\ No newline at end of file
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+On-disk cache for LLM extraction results used by debug and test runs
+Keyed by SHA-256 of the document content, with an opt-in simhash match for near-duplicates
+"""
+
+import os
+import re
+import json
+import hashlib
+import sqlite3
+import functools
+import threading
+from datetime import datetime
+
+DEFAULT_CACHE_PATH = os.path.join(".cache", "extract.sqlite")
+
+# Simhash distance (out of 64 bits) treated as the same document; ~Jaccard > 0.95
+_FUZZY_MAX_DISTANCE = 3
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def simhash(text):
+    """64-bit simhash over character 5-shingles of the normalized text"""
+    normalized = " ".join(_TOKEN_RE.findall(text.lower()))
+    shingles = [normalized[i:i + 5] for i in range(max(len(normalized) - 4, 1))]
+    weights = [0] * 64
+    for shingle in shingles:
+        h = int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=8).digest(), "big")
+        for bit in range(64):
+            weights[bit] += 1 if h >> bit & 1 else -1
+    value = 0
+    for bit in range(64):
+        if weights[bit] > 0:
+            value |= 1 << bit
+    # SQLite integers are signed 64-bit
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+class ExtractCache:
+    """SQLite-backed content -> extracted_data cache, safe for parallel test threads"""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, fuzzy=False):
+        self.fuzzy = fuzzy
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, simhash INTEGER NOT NULL, payload TEXT NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, content):
+        """Return cached extraction for content, exact match first then near-duplicate"""
+        key = hashlib.sha256(content.encode()).hexdigest()
+        with self._lock:
+            row = self._conn.execute("SELECT payload FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None and self.fuzzy:
+                fingerprint = simhash(content)
+                for payload, other in self._conn.execute("SELECT payload, simhash FROM cache"):
+                    if bin((fingerprint ^ other) & 0xFFFFFFFFFFFFFFFF).count("1") <= _FUZZY_MAX_DISTANCE:
+                        row = (payload,)
+                        break
+        return json.loads(row[0]) if row else None
+
+    def put(self, content, extracted_data):
+        """Store an extraction result for content"""
+        key = hashlib.sha256(content.encode()).hexdigest()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, simhash, payload) VALUES (?, ?, ?)",
+                (key, simhash(content), json.dumps(extracted_data)),
+            )
+            self._conn.commit()
+
+
+def disk_cache(path=DEFAULT_CACHE_PATH, fuzzy=False):
+    """Wrap an extract_data_node(self, state) method with the on-disk extraction cache"""
+    cache = ExtractCache(path, fuzzy)
+
+    def decorator(node):
+        @functools.wraps(node)
+        def wrapper(self, state):
+            cached = cache.get(state["content"])
+            if cached is not None:
+                current_time = datetime.now().isoformat()
+                state["extracted_data"] = cached
+                state["workflow_history"].append(f"Data extracted at {current_time} (cached)")
+                state["updated_at"] = current_time
+                print(f"Using cached extraction for document {state['id']}")
+                return state
+
+            state = node(self, state)
+            # Failed extractions (error status or an error payload) are retried on the next run rather than cached
+            extracted = state.get("extracted_data")
+            if state.get("status") != "error" and extracted and "error" not in extracted:
+                cache.put(state["content"], state["extracted_data"])
+            return state
+
+        return wrapper
+
+    return decorator
+
+
+def enable_extract_cache(path=DEFAULT_CACHE_PATH, fuzzy=None):
+    """Patch engine.DocumentProcessor so every workflow run goes through the cache"""
+    if fuzzy is None:
+        # Near-duplicate reuse can mask edits to amounts or IDs, so it is opt-in
+        fuzzy = os.getenv("EXTRACT_CACHE_FUZZY", "0") == "1"
+    from engine import DocumentProcessor
+
+    if not getattr(DocumentProcessor.extract_data_node, "__wrapped__", None):
+        DocumentProcessor.extract_data_node = disk_cache(path, fuzzy)(DocumentProcessor.extract_data_node)
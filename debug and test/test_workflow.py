@@ -5,17 +5,41 @@ This script tests various scenarios including automatic processing and human rev
 """
 
 import os
+import sys
 import time
 import uuid
+import asyncio
+import builtins
+import threading
 from datetime import datetime
-from engine import run_workflow, resume_workflow, setup_database
+from engine import (
+    run_workflow, resume_workflow, setup_database, batch_extract, preflight_llm,
+    get_app, WorkflowState
+)
+from extract_cache import enable_extract_cache
 
-def test_automatic_approval():
-    """Test a document that should be approved automatically"""
-    print("🧪 Test 1: Automatic Approval (Small Invoice)")
-    print("=" * 60)
-    
-    small_invoice = """
+# Cap concurrent workflow runs to stay under the OpenRouter rate limit
+_MAX_CONCURRENT_RUNS = int(os.getenv("TEST_MAX_CONCURRENCY", "4"))
+_run_limit = asyncio.Semaphore(_MAX_CONCURRENT_RUNS)
+
+class RateLimiter:
+    """Token bucket spacing LLM-backed calls; requests fire back to back until the RPM cap"""
+    
+    def __init__(self, rpm):
+        self.interval = 60.0 / rpm
+        self.next = 0.0
+    
+    async def acquire(self):
+        # Reserve the slot before sleeping so concurrent callers queue behind it
+        now = time.monotonic()
+        wait = max(0.0, self.next - now)
+        self.next = max(self.next, now) + self.interval
+        if wait:
+            await asyncio.sleep(wait)
+
+_rate_limiter = RateLimiter(int(os.getenv("OPENROUTER_RPM", "60")))
+
+SMALL_INVOICE = """
     INVOICE
     From: Small Business Inc.
     Invoice #: INV-2024-SMALL
@@ -25,14 +49,129 @@ def test_automatic_approval():
     Services provided:
     - Web design consultation: $500.00
     """
+
+LARGE_INVOICE = """
+    INVOICE
+    From: Enterprise Solutions Corp
+    Invoice #: INV-2024-LARGE
+    Due Date: 2024-10-30
+    Total Amount: $5,000.00
+    
+    Services provided:
+    - Enterprise software license: $4,500.00
+    - Implementation services: $500.00
+    """
+
+SUPPORT_TICKET = """
+    Customer Support Ticket
+    
+    From: angry.customer@email.com
+    Subject: Your service is terrible!
+    
+    I am absolutely furious with your service! This is the third time this month 
+    that your system has been down, and I'm losing money because of it. 
+    
+    This is completely unacceptable and I demand immediate action. I've been a 
+    customer for 5 years and this is the worst service I've ever experienced.
+    
+    Fix this NOW or I'm canceling my account and telling everyone I know to 
+    avoid your company!
+    
+    Customer: John Angry
+    Account: Premium Business
+    Priority: URGENT
+    """
+
+INVOICE_WITH_ISSUES = """
+    INVOICE
+    From: Incomplete Corp
+    Invoice #: 
+    Due Date: 2024-11-01
+    Total Amount: $2,500.00
+    
+    Services provided:
+    - Consulting services
+    """
+
+# Extraction the LLM would produce for INVOICE_WITH_ISSUES; seeds the resume test
+RESUME_SEED_DATA = {
+    "vendor_name": "Incomplete Corp",
+    "invoice_id": None,
+    "due_date": "2024-11-01",
+    "total_amount": 2500.00
+}
+
+# Extractions from one batched LLM call, keyed by document content
+_preextracted = {}
+
+class BufferedPrinter:
+    """Capture print() output and write it to stdout in coalesced chunks"""
+    
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self._buf = []
+        self._lock = threading.Lock()
+        self._task = None
+        self._print = builtins.print
+    
+    def print(self, *args, sep=" ", end="\n", file=None, flush=False):
+        if file is not None and file is not sys.stdout:
+            return self._print(*args, sep=sep, end=end, file=file, flush=flush)
+        text = (" " if sep is None else sep).join(map(str, args)) + ("\n" if end is None else end)
+        # print() is called from worker threads as well as the event loop
+        with self._lock:
+            self._buf.append(text)
+    
+    def flush(self):
+        with self._lock:
+            chunk, self._buf = "".join(self._buf), []
+        if chunk:
+            sys.stdout.write(chunk)
+            sys.stdout.flush()
+    
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            self.flush()
+    
+    def start(self):
+        builtins.print = self.print
+        self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        builtins.print = self._print
+        self.flush()
+
+async def run_workflow_async(document_content, document_id):
+    """Run the sync workflow in a worker thread, bounded by the run limit"""
+    async with _run_limit:
+        await _rate_limiter.acquire()
+        return await asyncio.to_thread(
+            run_workflow, document_content, document_id, _preextracted.get(document_content)
+        )
+
+async def resume_workflow_async(document_id, updated_data):
+    """Resume the sync workflow in a worker thread, bounded by the run limit"""
+    async with _run_limit:
+        return await asyncio.to_thread(resume_workflow, document_id, updated_data)
+
+async def test_automatic_approval():
+    """Test a document that should be approved automatically"""
+    print("🧪 Test 1: Automatic Approval (Small Invoice)")
+    print("=" * 60)
     
     document_id = f"test_auto_{uuid.uuid4().hex[:8]}"
     
     print(f"Submitting document: {document_id}")
-    result, app, config = run_workflow(small_invoice, document_id)
+    result, app, config = await run_workflow_async(SMALL_INVOICE, document_id)
     
     if result:
-        final_state = result[list(result.keys())[0]]
+        final_state = result
         print(f"✅ Final Status: {final_state.get('status')}")
         print(f"📊 Extracted Data: {final_state.get('extracted_data')}")
         
@@ -46,30 +185,18 @@ def test_automatic_approval():
     print()
     return document_id
 
-def test_human_review_required():
+async def test_human_review_required():
     """Test a document that requires human review"""
     print("🧪 Test 2: Human Review Required (Large Invoice)")
     print("=" * 60)
     
-    large_invoice = """
-    INVOICE
-    From: Enterprise Solutions Corp
-    Invoice #: INV-2024-LARGE
-    Due Date: 2024-10-30
-    Total Amount: $5,000.00
-    
-    Services provided:
-    - Enterprise software license: $4,500.00
-    - Implementation services: $500.00
-    """
-    
     document_id = f"test_review_{uuid.uuid4().hex[:8]}"
     
     print(f"Submitting document: {document_id}")
-    result, app, config = run_workflow(large_invoice, document_id)
+    result, app, config = await run_workflow_async(LARGE_INVOICE, document_id)
     
     if result:
-        final_state = result[list(result.keys())[0]]
+        final_state = result
         print(f"📋 Final Status: {final_state.get('status')}")
         print(f"🔍 Review Reason: {final_state.get('reason_for_review')}")
         print(f"📊 Extracted Data: {final_state.get('extracted_data')}")
@@ -84,38 +211,18 @@ def test_human_review_required():
     print()
     return document_id
 
-def test_customer_support_ticket():
+async def test_customer_support_ticket():
     """Test a customer support ticket scenario"""
     print("🧪 Test 3: Customer Support Ticket (Irate Customer)")
     print("=" * 60)
     
-    support_ticket = """
-    Customer Support Ticket
-    
-    From: angry.customer@email.com
-    Subject: Your service is terrible!
-    
-    I am absolutely furious with your service! This is the third time this month 
-    that your system has been down, and I'm losing money because of it. 
-    
-    This is completely unacceptable and I demand immediate action. I've been a 
-    customer for 5 years and this is the worst service I've ever experienced.
-    
-    Fix this NOW or I'm canceling my account and telling everyone I know to 
-    avoid your company!
-    
-    Customer: John Angry
-    Account: Premium Business
-    Priority: URGENT
-    """
-    
     document_id = f"test_support_{uuid.uuid4().hex[:8]}"
     
     print(f"Submitting ticket: {document_id}")
-    result, app, config = run_workflow(support_ticket, document_id)
+    result, app, config = await run_workflow_async(SUPPORT_TICKET, document_id)
     
     if result:
-        final_state = result[list(result.keys())[0]]
+        final_state = result
         print(f"📋 Final Status: {final_state.get('status')}")
         print(f"🔍 Review Reason: {final_state.get('reason_for_review')}")
         print(f"📊 Extracted Data: {final_state.get('extracted_data')}")
@@ -130,30 +237,44 @@ def test_customer_support_ticket():
     print()
     return document_id
 
-def test_resume_workflow():
+def seed_pending_review(document_id, content, extracted_data, reason):
+    """Write a pending_review checkpoint directly, as if await_human_review had just run"""
+    current_time = datetime.now().isoformat()
+    state = WorkflowState(
+        id=document_id,
+        content=content,
+        status="pending_review",
+        extracted_data=extracted_data,
+        workflow_history=[f"Seeded for review at {current_time}"],
+        reason_for_review=reason,
+        created_at=current_time,
+        updated_at=current_time
+    )
+    config = {"configurable": {"thread_id": document_id}}
+    get_app().update_state(config, state, as_node="await_human_review")
+    return state
+
+async def test_resume_workflow(integration=False):
     """Test resuming a workflow after human review"""
     print("🧪 Test 4: Workflow Resumption")
     print("=" * 60)
     
     # First, create a document that requires review
-    invoice_with_issues = """
-    INVOICE
-    From: Incomplete Corp
-    Invoice #: 
-    Due Date: 2024-11-01
-    Total Amount: $2,500.00
-    
-    Services provided:
-    - Consulting services
-    """
-    
     document_id = f"test_resume_{uuid.uuid4().hex[:8]}"
     
-    print(f"Step 1: Submitting document with missing data: {document_id}")
-    result, app, config = run_workflow(invoice_with_issues, document_id)
+    if integration:
+        print(f"Step 1: Submitting document with missing data: {document_id}")
+        result, app, config = await run_workflow_async(INVOICE_WITH_ISSUES, document_id)
+    else:
+        # Skip the submit round-trip; only the resume path is under test
+        print(f"Step 1: Seeding pending review checkpoint: {document_id}")
+        result = await asyncio.to_thread(
+            seed_pending_review, document_id, INVOICE_WITH_ISSUES,
+            dict(RESUME_SEED_DATA), "Missing invoice ID; Amount exceeds $1000 threshold"
+        )
     
     if result:
-        final_state = result[list(result.keys())[0]]
+        final_state = result
         if final_state.get('status') == 'pending_review':
             print("✅ Document correctly paused for review")
             print(f"🔍 Review needed: {final_state.get('reason_for_review')}")
@@ -169,10 +290,10 @@ def test_resume_workflow():
             
             # Resume the workflow
             print("Step 3: Resuming workflow...")
-            resume_result = resume_workflow(document_id, corrected_data)
+            resume_result = await resume_workflow_async(document_id, corrected_data)
             
             if resume_result:
-                resumed_state = resume_result[list(resume_result.keys())[0]]
+                resumed_state = resume_result
                 print(f"✅ Resumed Status: {resumed_state.get('status')}")
                 print(f"📊 Final Data: {resumed_state.get('extracted_data')}")
                 
@@ -210,8 +331,37 @@ def test_crash_recovery():
     
     print()
 
+async def _run_scenarios(integration=False):
+    """Run the workflow scenarios concurrently"""
+    printer = BufferedPrinter()
+    printer.start()
+    try:
+        documents = [SMALL_INVOICE, LARGE_INVOICE, SUPPORT_TICKET]
+        if integration:
+            documents.append(INVOICE_WITH_ISSUES)
+        try:
+            await _rate_limiter.acquire()
+            extractions = await asyncio.to_thread(batch_extract, documents)
+            _preextracted.update(
+                (doc, data) for doc, data in zip(documents, extractions) if data is not None
+            )
+        except Exception as e:
+            # Scenarios fall back to per-document extraction
+            print(f"⚠️  Batch extraction failed: {e}")
+        
+        return await asyncio.gather(
+            test_automatic_approval(),
+            test_human_review_required(),
+            test_customer_support_ticket(),
+            test_resume_workflow(integration),
+            return_exceptions=True,
+        )
+    finally:
+        await printer.stop()
+
 def main():
-    """Run all tests"""
+    """Run all tests; pass --integration to submit the resume test document end to end"""
+    integration = "--integration" in sys.argv[1:]
     print("🚀 AI Workflow Engine Test Suite")
     print("=" * 60)
     print(f"Started at: {datetime.now().isoformat()}")
@@ -224,25 +374,23 @@ def main():
         print("   OPENROUTER_API_KEY=your-api-key-here")
         return
     
-    # Run tests
+    # Fail fast on a bad key or model before any scenario runs the full graph
+    preflight_error = preflight_llm()
+    if preflight_error:
+        print(f"❌ ERROR: OpenRouter preflight request failed: {preflight_error}")
+        print("Check OPENROUTER_API_KEY and OPENROUTER_MODEL in your .env file")
+        return
+    
+    # Run tests concurrently; each scenario uses its own thread_id
     test_results = []
     
     try:
-        # Test 1: Automatic approval
-        test_results.append(test_automatic_approval())
-        time.sleep(2)
-        
-        # Test 2: Human review required
-        test_results.append(test_human_review_required())
-        time.sleep(2)
-        
-        # Test 3: Customer support ticket
-        test_results.append(test_customer_support_ticket())
-        time.sleep(2)
-        
-        # Test 4: Workflow resumption
-        test_results.append(test_resume_workflow())
-        time.sleep(2)
+        results = asyncio.run(_run_scenarios(integration))
+        for result in results:
+            if isinstance(result, BaseException):
+                print(f"❌ Test scenario error: {result}")
+            else:
+                test_results.append(result)
         
         # Test 5: Crash recovery info
         test_crash_recovery()
@@ -267,4 +415,5 @@ def main():
     print("- Use 'python submit.py --help' for submission options")
 
 if __name__ == "__main__":
+    enable_extract_cache()
     main()
\ No newline at end of file
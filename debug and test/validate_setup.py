@@ -3,34 +3,47 @@
 Setup validation script to ensure all components work correctly.
 """
 
+import io
 import os
 import sys
+import importlib
+import importlib.util
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from importlib.metadata import distribution, PackageNotFoundError
 from pathlib import Path
 
 def check_dependencies():
     """Check if all required dependencies are available"""
     print("Checking dependencies...")
     
+    # Distribution names, checked via installed metadata instead of importing them
     required_packages = [
         ('langgraph', 'LangGraph'),
         ('langchain', 'LangChain'),  
-        ('langchain_openai', 'LangChain OpenAI'),
+        ('langchain-openai', 'LangChain OpenAI'),
         ('streamlit', 'Streamlit'),
-        ('sqlite3', 'SQLite3'),
         ('requests', 'Requests'),
-        ('dotenv', 'Python Dotenv')
+        ('python-dotenv', 'Python Dotenv')
     ]
     
     missing_packages = []
     
     for package, name in required_packages:
         try:
-            __import__(package)
+            distribution(package)
             print(f"  [OK] {name}")
-        except ImportError:
+        except PackageNotFoundError:
             print(f"  [MISSING] {name}")
             missing_packages.append(package)
     
+    # sqlite3 ships with Python but can be left out of custom builds
+    if importlib.util.find_spec('sqlite3') is not None:
+        print("  [OK] SQLite3")
+    else:
+        print("  [MISSING] SQLite3")
+        missing_packages.append('sqlite3')
+    
     if missing_packages:
         print(f"\nMissing packages: {', '.join(missing_packages)}")
         print("Install with: pip install -r requirements.txt")
@@ -53,9 +66,11 @@ def check_files():
     ]
     
     missing_files = []
+    # One directory listing instead of a stat() per file
+    present = set(os.listdir('.'))
     
     for file_name in required_files:
-        if Path(file_name).exists():
+        if file_name in present:
             print(f"  [OK] {file_name}")
         else:
             print(f"  [MISSING] {file_name}")
@@ -145,20 +160,63 @@ def test_basic_workflow():
         print(f"  [ERROR] Workflow setup error: {e}")
         return False
 
+class _ThreadLocalStdout:
+    """Route writes from pool threads into per-check buffers"""
+    
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+    
+    def write(self, text):
+        return getattr(self.local, "buffer", self.stream).write(text)
+    
+    def flush(self):
+        getattr(self.local, "buffer", self.stream).flush()
+
+def _run_captured(router, check):
+    """Run a check with its output captured so reports print in check order"""
+    router.local.buffer = io.StringIO()
+    try:
+        return check(), router.local.buffer.getvalue()
+    except Exception as e:
+        return False, router.local.buffer.getvalue() + f"  [ERROR] {check.__name__}: {e}\n"
+    finally:
+        del router.local.buffer
+
 def main():
     """Run all validation checks"""
     print("=" * 60)
     print("AI Workflow Engine - Setup Validation")
     print("=" * 60)
     
-    checks = [
-        check_dependencies(),
-        check_files(), 
-        check_imports(),
-        check_environment(),
-        test_basic_workflow()
+    # Import engine once up front; check_imports reports any failure
+    try:
+        importlib.import_module("engine")
+    except Exception:
+        pass
+    
+    check_functions = [
+        check_dependencies,
+        check_files, 
+        check_imports,
+        check_environment,
+        test_basic_workflow
     ]
     
+    router = _ThreadLocalStdout(sys.stdout)
+    sys.stdout = router
+    try:
+        with ThreadPoolExecutor(max_workers=len(check_functions)) as executor:
+            futures = [executor.submit(_run_captured, router, check) for check in check_functions]
+            results = [future.result() for future in futures]
+    finally:
+        sys.stdout = router.stream
+    
+    checks = []
+    for passed, output in results:
+        sys.stdout.write(output)
+        checks.append(passed)
+    
     print("\n" + "=" * 60)
     print("VALIDATION SUMMARY")
     print("=" * 60)
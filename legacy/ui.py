@@ -21,12 +21,10 @@ class WorkflowDatabase:
     def get_pending_reviews(self) -> List[Dict[str, Any]]:
         """Get all workflows pending human review"""
         try:
-            from engine import create_workflow, setup_database
+            from engine import get_app
             
-            # Use the LangGraph API to get workflow states
-            workflow = create_workflow()
-            checkpointer = setup_database()
-            app = workflow.compile(checkpointer=checkpointer)
+            # Use the LangGraph API to get workflow states (shared app, compiled once)
+            app = get_app()
             
             # Get all thread IDs from database
             conn = sqlite3.connect(self.db_path)
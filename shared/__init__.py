@@ -0,0 +1,3 @@
+"""
+Shared types and database access for the AI Workflow Engine.
+"""
@@ -5,23 +5,161 @@ Shared database operations for the AI Workflow Engine.
 import sqlite3
 import json
 import os
-from typing import Optional, List, Dict, Any
+import queue
+import asyncio
+from contextlib import contextmanager
+from typing import Optional, List, Dict, Any, Iterator, Tuple, Callable, ContextManager
 from datetime import datetime
 from .types import AgentState, WorkflowStatus, WorkflowEvent
+from .serialization import dumps as _encode_json
+
+# Applied to every pooled read-write connection
+_SQLITE_PRAGMAS = """
+    PRAGMA journal_mode=WAL;
+    PRAGMA synchronous=NORMAL;
+    PRAGMA busy_timeout=5000;
+    PRAGMA temp_store=MEMORY;
+    PRAGMA mmap_size=268435456;
+"""
+
+# One statement text for every event insert, so sqlite3's statement cache compiles it once
+_INSERT_EVENT_SQL = """
+    INSERT INTO ag_ui_events (
+        workflow_id, event_type, data, step_name, timestamp
+    ) VALUES (?, ?, ?, ?, ?)
+"""
+
+# Bumped whenever _create_tables adds tables or indexes; stored in PRAGMA user_version
+_SCHEMA_VERSION = 1
+
+# Shared by every single-workflow event read so sqlite3's statement cache holds one entry
+_WORKFLOW_EVENTS_SQL = """
+    SELECT workflow_id, event_type, data, step_name, timestamp
+    FROM ag_ui_events 
+    WHERE workflow_id = ?
+    ORDER BY timestamp ASC
+"""
+
+# Keyset page of a workflow's events; (timestamp, id) resumes exactly after the last row sent
+_WORKFLOW_EVENTS_PAGE_SQL = """
+    SELECT id, workflow_id, event_type, data, step_name, timestamp
+    FROM ag_ui_events
+    WHERE workflow_id = ? AND (timestamp, id) > (?, ?)
+    ORDER BY timestamp ASC, id ASC
+    LIMIT ?
+"""
+
+# Served by the idx_ag_ui_workflows_pending partial index
+_PENDING_REVIEWS_SQL = """
+    SELECT workflow_id FROM ag_ui_workflows 
+    WHERE human_review_required = TRUE 
+    AND status = ?
+"""
+
+# Read-only connections inherit WAL mode from the file and can't change it
+_SQLITE_READ_PRAGMAS = """
+    PRAGMA busy_timeout=5000;
+    PRAGMA temp_store=MEMORY;
+    PRAGMA mmap_size=268435456;
+    PRAGMA cache_size=-20000;
+    PRAGMA query_only=1;
+"""
 
 
 class WorkflowDatabase:
     """Shared database operations for workflow management"""
     
-    def __init__(self, db_path: str = "./checkpoints/workflow.db"):
+    def __init__(self, db_path: str = "./checkpoints/workflow.db", pool_size: int = 4):
         self.db_path = db_path
         os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        # Writes go through one connection (WAL allows a single writer);
+        # reads get their own read-only connections so they never queue behind it
+        self._write_pool: queue.Queue = queue.Queue(maxsize=1)
+        self._write_pool.put_nowait(self._connect())
         self.init_ag_ui_tables()
+        self._read_pool: queue.Queue = queue.Queue(maxsize=pool_size)
+        for _ in range(pool_size):
+            self._read_pool.put_nowait(self._connect_readonly())
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Open a read-write connection with the pool's PRAGMAs applied"""
+        # IMMEDIATE: take the write lock when a transaction starts instead of upgrading mid-batch
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level="IMMEDIATE")
+        conn.executescript(_SQLITE_PRAGMAS)
+        return conn
+    
+    def _connect_readonly(self) -> sqlite3.Connection:
+        """Open a read-only connection to the same file"""
+        uri = f"file:{os.path.abspath(self.db_path)}?mode=ro"
+        # Autocommit: pure SELECTs never open an implicit transaction
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False, isolation_level=None)
+        conn.executescript(_SQLITE_READ_PRAGMAS)
+        return conn
+    
+    @contextmanager
+    def _borrow(
+        self, pool: queue.Queue, connect: Optional[Callable[[], sqlite3.Connection]] = None
+    ) -> Iterator[sqlite3.Connection]:
+        """Borrow a pooled connection; commits on success and rolls back on error.
+
+        With connect, an exhausted pool opens an extra connection; without it the caller waits.
+        """
+        if connect is None:
+            conn = pool.get()
+        else:
+            try:
+                conn = pool.get_nowait()
+            except queue.Empty:
+                # Readers only: open an extra connection rather than block
+                conn = connect()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            try:
+                pool.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+    
+    def _conn(self) -> ContextManager[sqlite3.Connection]:
+        """Borrow the read-write connection, waiting while another write holds it"""
+        # Never open a second writer: it would contend for the WAL write lock (SQLITE_BUSY)
+        return self._borrow(self._write_pool)
+    
+    def _read_conn(self) -> ContextManager[sqlite3.Connection]:
+        """Borrow a read-only connection"""
+        return self._borrow(self._read_pool, self._connect_readonly)
+    
+    def close(self) -> None:
+        """Close every idle pooled connection"""
+        # Refresh planner statistics for the indexes, as SQLite recommends before closing
+        try:
+            with self._conn() as conn:
+                conn.execute("PRAGMA optimize")
+        except sqlite3.Error:
+            pass
+        for pool in (self._read_pool, self._write_pool):
+            while True:
+                try:
+                    pool.get_nowait().close()
+                except queue.Empty:
+                    break
     
     def init_ag_ui_tables(self):
         """Initialize AG-UI specific tables alongside LangGraph tables"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        with self._conn() as conn:
+            cursor = conn.cursor()
+            # DDL runs only when the file predates the current schema
+            if cursor.execute("PRAGMA user_version").fetchone()[0] < _SCHEMA_VERSION:
+                self._create_tables(cursor)
+                cursor.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+            self._check_query_plans(cursor)
+    
+    def _create_tables(self, cursor: sqlite3.Cursor) -> None:
+        """Create the AG-UI tables if they don't exist yet"""
         
         # AG-UI workflow states table
         cursor.execute("""
@@ -64,14 +202,61 @@ class WorkflowDatabase:
             )
         """)
         
-        conn.commit()
-        conn.close()
+        # Pending-review lookups read only this small covering index
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_ag_ui_workflows_pending
+            ON ag_ui_workflows (status, workflow_id)
+            WHERE human_review_required = TRUE
+        """)
+        
+        # Per-workflow event history, already in timestamp order
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_ag_ui_events_workflow
+            ON ag_ui_events (workflow_id, timestamp)
+        """)
+    
+    def _check_query_plans(self, cursor: sqlite3.Cursor) -> None:
+        """Warn at startup if the hot read queries stopped using their indexes"""
+        cursor.execute("EXPLAIN QUERY PLAN " + _PENDING_REVIEWS_SQL, (WorkflowStatus.PENDING_REVIEW.value,))
+        plan = " ".join(row[-1] for row in cursor.fetchall())
+        if "idx_ag_ui_workflows_pending" not in plan:
+            print(f"Warning: pending review query is not using its index: {plan}")
     
     def save_agent_state(self, state: AgentState) -> None:
         """Save AG-UI agent state"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
+        with self._conn() as conn:
+            self._upsert_state(conn.cursor(), state)
+    
+    def transaction(self) -> ContextManager[sqlite3.Connection]:
+        """Borrow the write connection for several statements committed together"""
+        return self._conn()
+    
+    def write_batch(
+        self,
+        state: Optional[AgentState],
+        events: Optional[List[WorkflowEvent]] = None,
+        review_reason: Optional[str] = None,
+        remove_from_queue: bool = False,
+        event_rows: Optional[List[Tuple[str, str, Dict[str, Any], Optional[str], str]]] = None
+    ) -> None:
+        """Persist a state, its events and review-queue change in a single transaction"""
+        with self.transaction() as conn:
+            cursor = conn.cursor()
+            if state is not None:
+                self._upsert_state(cursor, state)
+            if events:
+                self._insert_events(cursor, events)
+            if event_rows:
+                self._insert_event_rows(cursor, event_rows)
+            if review_reason is not None:
+                self._enqueue_review(cursor, state.workflow_id, review_reason, 0)
+            if remove_from_queue:
+                cursor.execute("""
+                    DELETE FROM ag_ui_review_queue WHERE workflow_id = ?
+                """, (state.workflow_id,))
+    
+    def _upsert_state(self, cursor: sqlite3.Cursor, state: AgentState) -> None:
+        """Write one agent state row on an open cursor"""
         # Handle status field (could be enum or string)
         status_value = state.status.value if hasattr(state.status, 'value') else str(state.status)
         
@@ -93,29 +278,61 @@ class WorkflowDatabase:
             state.created_at if isinstance(state.created_at, str) else state.created_at.isoformat(),
             state.updated_at if isinstance(state.updated_at, str) else state.updated_at.isoformat()
         ))
-        
-        conn.commit()
-        conn.close()
     
     def get_agent_state(self, workflow_id: str) -> Optional[AgentState]:
         """Get AG-UI agent state"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT * FROM ag_ui_workflows WHERE workflow_id = ?
-        """, (workflow_id,))
-        
-        row = cursor.fetchone()
-        conn.close()
-        
-        if not row:
-            return None
+        with self._read_conn() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT * FROM ag_ui_workflows WHERE workflow_id = ?
+            """, (workflow_id,))
+            
+            row = cursor.fetchone()
+            if not row:
+                return None
+            
+            # Convert row to AgentState
+            columns = [desc[0] for desc in cursor.description]
+            events = self._fetch_events(cursor, workflow_id)
+        return self._row_to_state(dict(zip(columns, row)), events)
+    
+    def get_agent_states_bulk(self, ids: List[str]) -> List[AgentState]:
+        """Get several AG-UI agent states in one query, most recently updated first"""
+        if not ids:
+            return []
         
-        # Convert row to AgentState
-        columns = [desc[0] for desc in cursor.description]
-        data = dict(zip(columns, row))
+        placeholders = ",".join("?" * len(ids))
+        with self._read_conn() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT * FROM ag_ui_workflows WHERE workflow_id IN ({placeholders})
+                ORDER BY updated_at DESC
+            """, ids)
+            columns = [desc[0] for desc in cursor.description]
+            rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+            
+            # Fetch the events for every workflow with a single query as well
+            cursor.execute(f"""
+                SELECT workflow_id, event_type, data, step_name, timestamp
+                FROM ag_ui_events 
+                WHERE workflow_id IN ({placeholders})
+                ORDER BY timestamp ASC
+            """, ids)
+            event_rows = cursor.fetchall()
         
+        events: Dict[str, List[WorkflowEvent]] = {}
+        for row in event_rows:
+            events.setdefault(row[0], []).append(WorkflowEvent(
+                workflow_id=row[0],
+                event_type=row[1],
+                data=json.loads(row[2]),
+                step_name=row[3],
+                timestamp=row[4]
+            ))
+        return [self._row_to_state(data, events.get(data['workflow_id'], [])) for data in rows]
+    
+    def _row_to_state(self, data: Dict[str, Any], events: List[WorkflowEvent]) -> AgentState:
+        """Build an AgentState from an ag_ui_workflows row and its events"""
         # Parse JSON fields
         if data['extracted_data']:
             from .types import DocumentExtractedData
@@ -129,93 +346,168 @@ class WorkflowDatabase:
         # data['created_at'] = datetime.fromisoformat(data['created_at'])
         # data['updated_at'] = datetime.fromisoformat(data['updated_at'])
         
-        # Get workflow events
-        data['workflow_history'] = self.get_workflow_events(workflow_id)
+        data['workflow_history'] = events
         
         return AgentState(**data)
     
     def add_workflow_event(self, event: WorkflowEvent) -> None:
         """Add workflow event"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            INSERT INTO ag_ui_events (
-                workflow_id, event_type, data, step_name, timestamp
-            ) VALUES (?, ?, ?, ?, ?)
-        """, (
+        with self._conn() as conn:
+            self._insert_events(conn.cursor(), [event])
+    
+    def add_workflow_events_batch(self, events: List[WorkflowEvent]) -> None:
+        """Add several workflow events in one transaction"""
+        with self._conn() as conn:
+            self._insert_events(conn.cursor(), events)
+    
+    def add_workflow_event_rows(self, rows: List[Tuple[str, str, Dict[str, Any], Optional[str], str]]) -> None:
+        """Add (workflow_id, event_type, data, step_name, timestamp) tuples without building WorkflowEvent models"""
+        with self._conn() as conn:
+            self._insert_event_rows(conn.cursor(), rows)
+    
+    def _insert_events(self, cursor: sqlite3.Cursor, events: List[WorkflowEvent]) -> None:
+        """Insert workflow events on an open cursor"""
+        self._insert_event_rows(cursor, [(
             event.workflow_id,
             event.event_type,
-            json.dumps(event.data),
+            event.data,
             event.step_name,
             event.timestamp
-        ))
-        
-        conn.commit()
-        conn.close()
+        ) for event in events])
+    
+    def _insert_event_rows(self, cursor: sqlite3.Cursor, rows: List[Tuple[str, str, Dict[str, Any], Optional[str], str]]) -> None:
+        """Insert raw event tuples on an open cursor"""
+        cursor.executemany(_INSERT_EVENT_SQL, [
+            (workflow_id, event_type, _encode_json(data), step_name, timestamp)
+            for workflow_id, event_type, data, step_name, timestamp in rows
+        ])
     
     def get_workflow_events(self, workflow_id: str) -> List[WorkflowEvent]:
         """Get all events for a workflow"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT workflow_id, event_type, data, step_name, timestamp
-            FROM ag_ui_events 
-            WHERE workflow_id = ?
-            ORDER BY timestamp ASC
-        """, (workflow_id,))
-        
-        events = []
-        for row in cursor.fetchall():
-            events.append(WorkflowEvent(
-                workflow_id=row[0],
-                event_type=row[1],
-                data=json.loads(row[2]),
-                step_name=row[3],
-                timestamp=row[4]
-            ))
+        with self._read_conn() as conn:
+            return self._fetch_events(conn.cursor(), workflow_id)
+    
+    def workflow_exists(self, workflow_id: str) -> bool:
+        """Whether an AG-UI workflow row exists"""
+        with self._read_conn() as conn:
+            return conn.execute(
+                "SELECT 1 FROM ag_ui_workflows WHERE workflow_id = ?", (workflow_id,)
+            ).fetchone() is not None
+    
+    def fetch_workflow_event_rows(
+        self, workflow_id: str, after: Optional[Tuple[str, int]] = None, limit: int = 256
+    ) -> Tuple[List[Tuple[str, str, str, Optional[str], str]], Optional[Tuple[str, int]]]:
+        """Return one page of raw event rows (data left as JSON text) and the key for the next page.
+
+        Each call borrows and returns its own connection, so callers can page
+        across awaits without holding a pooled connection; the key is None after the last page.
+        """
+        last_timestamp, last_id = after or ("", 0)
+        with self._read_conn() as conn:
+            rows = conn.execute(
+                _WORKFLOW_EVENTS_PAGE_SQL, (workflow_id, last_timestamp, last_id, limit)
+            ).fetchall()
+        if len(rows) < limit:
+            next_key = None
+        else:
+            next_key = (rows[-1][5], rows[-1][0])
+        return [row[1:] for row in rows], next_key
+    
+    def _fetch_events(self, cursor: sqlite3.Cursor, workflow_id: str) -> List[WorkflowEvent]:
+        """Load a workflow's events on an open cursor"""
+        cursor.execute(_WORKFLOW_EVENTS_SQL, (workflow_id,))
         
-        conn.close()
-        return events
+        return [WorkflowEvent(
+            workflow_id=row[0],
+            event_type=row[1],
+            data=json.loads(row[2]),
+            step_name=row[3],
+            timestamp=row[4]
+        ) for row in cursor.fetchall()]
     
     def get_pending_reviews(self) -> List[str]:
         """Get workflows pending human review"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT workflow_id FROM ag_ui_workflows 
-            WHERE human_review_required = TRUE 
-            AND status = ?
-        """, (WorkflowStatus.PENDING_REVIEW.value,))
-        
-        workflow_ids = [row[0] for row in cursor.fetchall()]
-        conn.close()
-        return workflow_ids
+        with self._read_conn() as conn:
+            cursor = conn.execute(_PENDING_REVIEWS_SQL, (WorkflowStatus.PENDING_REVIEW.value,))
+            return [row[0] for row in cursor.fetchall()]
+    
+    def get_all_workflows(self) -> List[Dict[str, Any]]:
+        """Get a summary of every workflow, most recently updated first"""
+        with self._read_conn() as conn:
+            cursor = conn.execute("""
+                SELECT workflow_id, status, current_step, human_review_required,
+                       error_message, created_at, updated_at
+                FROM ag_ui_workflows
+                ORDER BY updated_at DESC
+            """)
+            columns = [desc[0] for desc in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
     
     def add_to_review_queue(self, workflow_id: str, reason: str, priority: int = 0) -> None:
         """Add workflow to human review queue"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
+        with self._conn() as conn:
+            self._enqueue_review(conn.cursor(), workflow_id, reason, priority)
+    
+    def _enqueue_review(self, cursor: sqlite3.Cursor, workflow_id: str, reason: str, priority: int) -> None:
+        """Upsert a review queue entry on an open cursor"""
         cursor.execute("""
             INSERT OR REPLACE INTO ag_ui_review_queue (
                 workflow_id, reason, priority, created_at
             ) VALUES (?, ?, ?, ?)
         """, (workflow_id, reason, priority, datetime.now().isoformat()))
-        
-        conn.commit()
-        conn.close()
     
     def remove_from_review_queue(self, workflow_id: str) -> None:
         """Remove workflow from review queue"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            DELETE FROM ag_ui_review_queue WHERE workflow_id = ?
-        """, (workflow_id,))
-        
-        conn.commit()
-        conn.close()
\ No newline at end of file
+        with self._conn() as conn:
+            conn.execute("""
+                DELETE FROM ag_ui_review_queue WHERE workflow_id = ?
+            """, (workflow_id,))
+
+
+class WriterActor:
+    """Single asyncio task that performs every database write, one at a time"""
+    
+    def __init__(self):
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+    
+    def start(self) -> None:
+        """Start consuming queued writes"""
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+    
+    async def stop(self) -> None:
+        """Finish queued writes, then stop the task"""
+        if self._task is None:
+            return
+        await self._queue.join()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._queue = None
+    
+    def submit(self, op: Callable[..., Any], *args: Any, **kwargs: Any) -> "asyncio.Future[Any]":
+        """Queue a blocking write; the returned future resolves once it has run"""
+        if self._queue is None:
+            # Not started (e.g. scripts and tests): run on a worker thread directly
+            return asyncio.ensure_future(asyncio.to_thread(op, *args, **kwargs))
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((op, args, kwargs, future))
+        return future
+    
+    async def _run(self) -> None:
+        while True:
+            op, args, kwargs, future = await self._queue.get()
+            try:
+                result = await asyncio.to_thread(op, *args, **kwargs)
+            except Exception as e:
+                if not future.cancelled():
+                    future.set_exception(e)
+            else:
+                if not future.cancelled():
+                    future.set_result(result)
+            finally:
+                self._queue.task_done()
@@ -0,0 +1,58 @@
+"""
+Shared JSON and timestamp helpers for the AI Workflow Engine.
+"""
+
+import json
+import time
+from datetime import datetime
+from typing import Any
+
+# Server-sent events framing around each JSON payload
+SSE_PREFIX = b"data: "
+SSE_SUFFIX = b"\n\n"
+
+try:
+    import orjson
+except ImportError:
+    # Optional speedup; fall back to the stdlib json module
+    orjson = None
+
+if orjson is not None:
+    def dumps(obj: Any) -> str:
+        """Compact JSON text; unknown types are rendered with str()"""
+        return orjson.dumps(obj, default=str).decode()
+
+    def dumps_pretty(obj: Any) -> bytes:
+        """Indented JSON bytes for files written to disk"""
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+
+    def sse_frame(obj: Any) -> bytes:
+        """One SSE data frame holding obj as JSON"""
+        return SSE_PREFIX + orjson.dumps(obj, default=str) + SSE_SUFFIX
+
+    # orjson.JSONDecodeError subclasses json.JSONDecodeError, so callers catch either
+    loads = orjson.loads
+else:
+    def dumps(obj: Any) -> str:
+        """Compact JSON text; unknown types are rendered with str()"""
+        return json.dumps(obj, default=str)
+
+    def dumps_pretty(obj: Any) -> bytes:
+        """Indented JSON bytes for files written to disk"""
+        return json.dumps(obj, indent=2).encode()
+
+    def sse_frame(obj: Any) -> bytes:
+        """One SSE data frame holding obj as JSON"""
+        return SSE_PREFIX + json.dumps(obj, default=str).encode() + SSE_SUFFIX
+
+    loads = json.loads
+
+# Millisecond-resolution ISO timestamp cache: [epoch_millisecond, iso_string]
+_ts_cache = [0, ""]
+
+def now_iso() -> str:
+    """Current local time as an ISO string with milliseconds, re-rendered at most once per millisecond"""
+    t = int(time.time() * 1000)
+    if t != _ts_cache[0]:
+        _ts_cache[:] = [t, datetime.fromtimestamp(t / 1000).isoformat(timespec="milliseconds")]
+    return _ts_cache[1]
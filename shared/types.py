@@ -2,9 +2,9 @@
 Shared type definitions for the AI Workflow Engine.
 """
 
-from typing import TypedDict, List, Dict, Any, Optional
+from typing import TypedDict, List, Dict, Any, Optional, Tuple
 from enum import Enum
-from pydantic import BaseModel
+from pydantic import BaseModel, PrivateAttr
 from datetime import datetime
 
 
@@ -88,6 +88,15 @@ class AgentResponse(BaseModel):
     timestamp: str
     workflow_id: Optional[str] = None
 
+    def to_wire_dict(self) -> Dict[str, Any]:
+        """Plain dict for streaming, skipping model_dump's validation/serialization pass"""
+        return {
+            "type": self.type,
+            "data": self.data,
+            "timestamp": self.timestamp,
+            "workflow_id": self.workflow_id,
+        }
+
 
 class AgentState(BaseModel):
     """AG-UI compatible agent state"""
@@ -104,5 +113,8 @@ class AgentState(BaseModel):
     created_at: datetime  # Changed to string for compatibility
     updated_at: datetime  # Changed to string for compatibility
     
+    # (extracted_data it was built from, its model_dump()); see the server's _extracted_dict
+    _extracted_cache: Tuple[Any, Dict[str, Any]] = PrivateAttr(default=(None, {}))
+    
     class Config:
         use_enum_values = True
\ No newline at end of file
@@ -102,7 +102,8 @@ def test_database():
     db.add_workflow_event(event)
     print("✅ Added workflow event")
     
-    # Clean up test database
+    # Clean up test database (closing the pool also drops the WAL sidecar files)
+    db.close()
     os.remove("./test_workflow.db")
     print("✅ Cleaned up test database")
     